@@ -69,7 +69,7 @@ class ClassifyCats(activity.Activity):
         toolbarbox.toolbar.insert(button, -1)
 
     def _change(self, button):
-        if self.area.timeout_id is None:
+        if not self.area.is_running():
             self.button.set_tooltip(_("Stop"))
             self.area.start()
         else:
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+# Headless benchmarks for puzzle generation, hit-testing and frame
+# rendering. Every result is printed as one JSON object per line:
+#
+#   python3 bench.py --output bench_output.txt
+
+import argparse
+import json
+import logging
+import random
+import sys
+import time
+
+from engine import GameEngine
+from engine import GameType
+from levels import LevelPack
+
+
+GAME_TYPE_NAMES = {
+    GameType.DIVIDED_SCREEN: "divided_screen",
+    GameType.ROWS: "rows",
+    GameType.CHOOSE: "choose",
+}
+EXTRA_CAT_COUNTS = [100, 1000, 5000]
+
+
+def get_stats(times):
+    times = sorted(times)
+    count = len(times)
+    return {"runs": count,
+            "mean_ms": sum(times) / count * 1000,
+            "median_ms": times[count // 2] * 1000,
+            "p95_ms": times[min(count - 1, int(count * 0.95))] * 1000,
+            "max_ms": times[-1] * 1000}
+
+
+def make_engine(game_type, cats, width, height, seed):
+    engine = GameEngine("levels.json", seed=seed)
+    engine.set_size(width, height)
+    engine.level_data = {"type": game_type, "cats": cats}
+    engine.count = 15
+    engine.setup_puzzle()
+    return engine
+
+
+def get_cat_counts(levels, game_type):
+    counts = set(EXTRA_CAT_COUNTS)
+    if game_type == GameType.CHOOSE:
+        # Only odd counts make valid CHOOSE levels.
+        counts = set(count | 1 for count in counts)
+
+    for level, level_data in levels.items():
+        if level_data["type"] == game_type:
+            counts.add(level_data["cats"])
+
+    return sorted(counts)
+
+
+def bench_generation(engine, runs):
+    times = []
+    for i in range(runs):
+        start = time.perf_counter()
+        engine.setup_puzzle()
+        times.append(time.perf_counter() - start)
+
+    return get_stats(times)
+
+
+def bench_divide(engine, runs):
+    times = []
+    for i in range(runs):
+        start = time.perf_counter()
+        engine.generator.divide_into_even_odd(engine.level_data["cats"])
+        times.append(time.perf_counter() - start)
+
+    return get_stats(times)
+
+
+def bench_hit_testing(engine, runs):
+    points = [(random.uniform(0, engine.width), random.uniform(0, engine.height))
+              for i in range(runs)]
+
+    times = []
+    for x, y in points:
+        start = time.perf_counter()
+        engine.motion(x, y)
+        times.append(time.perf_counter() - start)
+
+    return get_stats(times)
+
+
+def bench_drag(engine, runs):
+    cat = next(iter(engine.cats))
+    engine.over_cat = cat
+    engine.press(cat.x + cat.width / 2, cat.y + cat.height / 2)
+
+    times = []
+    for i in range(runs):
+        x = random.uniform(0, engine.width)
+        y = random.uniform(0, engine.height)
+        start = time.perf_counter()
+        engine.motion(x, y)
+        times.append(time.perf_counter() - start)
+
+    engine.release(0, 0)
+    return get_stats(times)
+
+
+def bench_render(engine, runs, width, height):
+    # Imported here so the other benchmarks also run without cairo.
+    from renderer import Renderer
+    from renderer import render_frame
+
+    renderer = Renderer(engine)
+    surface = render_frame(renderer, width, height)
+
+    times = []
+    for i in range(runs):
+        start = time.perf_counter()
+        render_frame(renderer, width, height, surface)
+        times.append(time.perf_counter() - start)
+
+    return get_stats(times)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Classify Cats benchmarks")
+    parser.add_argument("--width", type=int, default=1200)
+    parser.add_argument("--height", type=int, default=825)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-render", action="store_true",
+                        help="skip the benchmarks which need cairo")
+    parser.add_argument("--output", help="file to write the results to")
+    args = parser.parse_args(argv)
+
+    # Stress levels are expected not to fit on the screen.
+    logging.getLogger().setLevel(logging.ERROR)
+    random.seed(args.seed)
+    levels = LevelPack("levels.json")
+
+    output = sys.stdout
+    if args.output is not None:
+        output = open(args.output, "w")
+
+    def report(name, game_type, cats, stats):
+        result = {"benchmark": name,
+                  "type": GAME_TYPE_NAMES[game_type],
+                  "cats": cats,
+                  "width": args.width,
+                  "height": args.height}
+        result.update(stats)
+        output.write(json.dumps(result, sort_keys=True) + "\n")
+        output.flush()
+
+    for game_type in sorted(GAME_TYPE_NAMES):
+        for cats in get_cat_counts(levels, game_type):
+            engine = make_engine(game_type, cats, args.width, args.height, args.seed)
+
+            report("generation", game_type, cats,
+                   bench_generation(engine, args.runs))
+
+            if game_type == GameType.CHOOSE:
+                report("divide_into_even_odd", game_type, cats,
+                       bench_divide(engine, args.runs))
+
+            report("hit_testing", game_type, cats,
+                   bench_hit_testing(engine, args.runs * 10))
+
+            if game_type == GameType.DIVIDED_SCREEN:
+                report("drag", game_type, cats,
+                       bench_drag(engine, args.runs * 10))
+
+            if not args.no_render:
+                report("render", game_type, cats,
+                       bench_render(engine, args.runs, args.width, args.height))
+
+    if output is not sys.stdout:
+        output.close()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+# Finds out how many cats this device can drag around within the frame
+# budget, by rendering synthetic DIVIDED_SCREEN frames with more and more
+# cats. The result is saved per device and screen size:
+#
+#   python3 capability.py --width 1200 --height 825
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import time
+
+from engine import GameEngine
+from engine import GameType
+
+
+PROBE_VERSION = 1
+FRAME_BUDGET_MS = 1000.0 / 30
+PROBE_CAT_COUNTS = [10, 15, 20, 30, 40, 60, 80, 120, 160]
+PROBE_FRAMES = 5
+
+
+def get_device_key(width, height, scale=1):
+    return "v%d-%s-%s-%dx%d@%d" % (PROBE_VERSION, platform.node(),
+                                   platform.machine(), width, height, scale)
+
+
+class CapabilityProbe(object):
+
+    # step() measures one cat count and returns True while there are more
+    # to measure, so the probe can run from an idle callback. Counts are
+    # tried in increasing order and probing stops at the first one over
+    # budget.
+
+    def __init__(self, width, height, scale=1, budget_ms=FRAME_BUDGET_MS,
+                 counts=PROBE_CAT_COUNTS, frames=PROBE_FRAMES, seed=0):
+        self.width = width
+        self.height = height
+        self.scale = scale
+        self.budget_ms = budget_ms
+        self.counts = list(counts)
+        self.frames = frames
+        self.seed = seed
+        self.samples = {}
+        self.max_cats = None
+        self.done_cb = None
+
+    def measure(self, cats):
+        # Imported here so the engine never depends on cairo.
+        import cairo
+        from renderer import Renderer
+        from renderer import get_cat_rect
+        from renderer import union_rects
+
+        engine = GameEngine("levels.json", seed=self.seed)
+        engine.set_size(self.width, self.height)
+        engine.level_data = {"type": GameType.DIVIDED_SCREEN, "cats": cats}
+        engine.count = 15
+        engine.setup_puzzle()
+
+        renderer = Renderer(engine)
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32,
+                                     self.width * self.scale,
+                                     self.height * self.scale)
+        surface.set_device_scale(self.scale, self.scale)
+
+        def draw(rect=None):
+            # The same call GameArea makes from its draw handler.
+            context = cairo.Context(surface)
+            if rect is not None:
+                context.rectangle(*rect)
+                context.clip()
+
+            renderer.draw(context, self.width, self.height, self.scale)
+            surface.flush()
+
+        draw()
+
+        # Every frame drags a cat across the screen and only redraws the
+        # area it covered before and after the move, as GameArea does.
+        cat = next(iter(engine.cats))
+        engine.over_cat = cat
+        engine.press(cat.x + cat.width / 2, cat.y + cat.height / 2)
+
+        times = []
+        for frame in range(self.frames):
+            x = (frame + 1) * self.width / (self.frames + 1)
+            start = time.perf_counter()
+            old_rect = get_cat_rect(cat)
+            engine.motion(x, self.height / 2)
+            draw(union_rects(old_rect, get_cat_rect(cat)))
+            times.append((time.perf_counter() - start) * 1000)
+
+        times.sort()
+        return times[len(times) // 2]
+
+    def step(self):
+        if not self.counts:
+            return False
+
+        cats = self.counts.pop(0)
+        frame_ms = self.measure(cats)
+        self.samples[cats] = frame_ms
+
+        if frame_ms <= self.budget_ms:
+            self.max_cats = cats
+        else:
+            self.counts = []
+
+        if self.counts:
+            return True
+
+        if self.done_cb is not None:
+            self.done_cb(self.get_result())
+
+        return False
+
+    def run(self):
+        while self.step():
+            pass
+
+        return self.get_result()
+
+    def get_result(self):
+        # When even the smallest count is over budget it is still the cap,
+        # the game can't be made any lighter.
+        max_cats = self.max_cats
+        if max_cats is None and self.samples:
+            max_cats = min(self.samples)
+
+        return {"max_cats": max_cats,
+                "budget_ms": self.budget_ms,
+                "samples": dict((str(cats), ms) for cats, ms in self.samples.items()),
+                "time": time.time()}
+
+
+def load_capabilities(path, key):
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path) as file:
+            return json.load(file).get(key)
+
+    except (IOError, OSError, ValueError, AttributeError) as e:
+        logging.warning("Can't read the device capabilities from %s: %s", path, e)
+        return None
+
+
+def save_capabilities(path, key, result):
+    data = {}
+    if os.path.exists(path):
+        try:
+            with open(path) as file:
+                data = json.load(file)
+        except (IOError, OSError, ValueError):
+            data = {}
+
+    data[key] = result
+
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w") as file:
+            json.dump(data, file)
+
+        os.rename(tmp_path, path)
+
+    except (IOError, OSError) as e:
+        logging.warning("Can't save the device capabilities to %s: %s", path, e)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Classify Cats device probe")
+    parser.add_argument("--width", type=int, default=1200)
+    parser.add_argument("--height", type=int, default=825)
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--budget", type=float, default=FRAME_BUDGET_MS,
+                        help="frame budget in milliseconds")
+    parser.add_argument("--output", help="capabilities file to update")
+    args = parser.parse_args(argv)
+
+    logging.getLogger().setLevel(logging.ERROR)
+    probe = CapabilityProbe(args.width, args.height, args.scale, args.budget)
+    result = probe.run()
+
+    if args.output is not None:
+        save_capabilities(args.output, get_device_key(args.width, args.height, args.scale), result)
+
+    print(json.dumps(result, sort_keys=True))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
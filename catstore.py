@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+from array import array
+
+
+class CatFlags:
+    DRAGGED = 1
+
+
+class Cat(object):
+
+    # A view over one row of a CatStore, the data itself lives in the
+    # store columns. Views are made when asked for and not kept, so two
+    # views of the same row are equal without being the same object.
+
+    __slots__ = ("store", "index")
+
+    def __init__(self, store, index):
+        self.store = store
+        self.index = index
+
+    def __eq__(self, other):
+        return (isinstance(other, Cat) and
+                self.store is other.store and self.index == other.index)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((id(self.store), self.index))
+
+    @property
+    def cat_id(self):
+        return self.store.ids[self.index]
+
+    @property
+    def x(self):
+        return self.store.xs[self.index]
+
+    @x.setter
+    def x(self, value):
+        self.store.xs[self.index] = value
+
+    @property
+    def y(self):
+        return self.store.ys[self.index]
+
+    @y.setter
+    def y(self, value):
+        self.store.ys[self.index] = value
+
+    @property
+    def width(self):
+        return self.store.widths[self.index]
+
+    @property
+    def height(self):
+        return self.store.heights[self.index]
+
+    @property
+    def dragged(self):
+        return bool(self.store.flags[self.index] & CatFlags.DRAGGED)
+
+    @dragged.setter
+    def dragged(self, value):
+        if value:
+            self.store.flags[self.index] |= CatFlags.DRAGGED
+        else:
+            self.store.flags[self.index] &= ~CatFlags.DRAGGED
+
+
+class CatStore(object):
+
+    # Struct of arrays holding every cat of a puzzle, bulk operations work
+    # on whole columns instead of going through the views.
+    #
+    # Only the columns are stored, a Cat view is made when one is asked for.
+
+    def __init__(self):
+        self.ids = array("B")
+        self.xs = array("d")
+        self.ys = array("d")
+        self.widths = array("H")
+        self.heights = array("H")
+        self.flags = array("B")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        for index in range(len(self.ids)):
+            yield Cat(self, index)
+
+    def __getitem__(self, index):
+        if not 0 <= index < len(self.ids):
+            raise IndexError(index)
+
+        return Cat(self, index)
+
+    def add(self, cat_id, width, height, x=-100, y=-100):
+        self.ids.append(cat_id)
+        self.xs.append(x)
+        self.ys.append(y)
+        self.widths.append(width)
+        self.heights.append(height)
+        self.flags.append(0)
+        return Cat(self, len(self.ids) - 1)
+
+    def set_positions(self, xs, ys):
+        # The columns are copied, the layouts cached on a Puzzle are shared.
+        self.xs = array("d", xs)
+        self.ys = array("d", ys)
+
+    def count_ids(self):
+        ids = self.ids.tobytes()
+        return dict((cat_id, ids.count(cat_id)) for cat_id in range(1, 5))
@@ -0,0 +1,585 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016, Cristian García <cristian99garcia@gmail.com>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+# The game rules live here, without any GTK dependency: GameArea only
+# forwards input to the engine and renders its state, and the engine
+# can be driven headless by calling tick() instead of using a main loop.
+
+from array import array
+
+from catstore import CatStore
+from highscore import HighscoreStore
+from levels import LevelPack
+from profiler import Profiler
+from puzzles import GameType
+from puzzles import PuzzleGenerator
+from puzzles import SideType
+from puzzles import denormalize_position
+from puzzles import get_positions
+from puzzles import normalize_position
+from scene import Scene
+from timers import ManualClock
+from timers import TimerService
+
+
+class GameState:
+    WELCOME = 0
+    COUNTDOWN = 1
+    PLAYING = 2
+    ROUND_END = 3
+    GAME_OVER = 4
+
+
+class RoundResult:
+    PLACED_CORRECTLY = 0
+    PLACED_WRONG = 1
+    SELECTED_CORRECTLY = 2
+    SELECTED_WRONG = 3
+    NOT_SELECTED = 4
+    CHOSE_CORRECTLY = 5
+    CHOSE_WRONG = 6
+    NOT_CHOSEN = 7
+
+
+class GameEngine(object):
+
+    def __init__(self, levels_path, highscore_path=None,
+                 timeout_add=None, source_remove=None, seed=None,
+                 levels_cache_dir=None):
+        # timeout_add and source_remove have the GObject signatures; when
+        # they are not given the engine runs on a manual clock moved by
+        # tick().
+        self.clock = None
+        if timeout_add is None:
+            self.clock = ManualClock()
+            self.timers = TimerService(clock=self.clock)
+        else:
+            self.timers = TimerService(timeout_add, source_remove)
+
+        self.changed_cb = None
+        self.prefetch_cb = None
+        self.round_log = None
+        self.profiler = Profiler()
+        self.highscores = HighscoreStore(highscore_path, timeout_add, source_remove)
+
+        self.width = 0
+        self.height = 0
+        self.line_width = 10
+        self.generator = PuzzleGenerator(seed, self.line_width)
+        self.puzzle = None
+        self.puzzle_cats = CatStore()
+        self.next_round = None
+        self.cats_count = {}
+        self.misplaced_cats = set()
+        self.cats = Scene()
+        self.selected_cat = None
+        self.over_cat = None
+        self.selected_option = None
+        self.over_option = None
+        self.clicked = []
+        self.sides = [SideType.EVEN, SideType.ODD]
+        self.state = GameState.WELCOME
+        self.countdown = None
+        self.count = None
+        self.reaction_time = 0
+        self.reaction_time_ms = None
+        self.level = 1
+        self.levels = LevelPack(levels_path, levels_cache_dir)
+        self.level_data = {}
+        self.max_cats = None
+        # Set from the device probe at any time, used from the next start()
+        # on so a game never mixes capped and uncapped puzzles.
+        self.next_max_cats = None
+        self.score = 0
+        self.highscore = self.highscores.load()
+        self.puzzle_count = None
+        self.win = True
+        self.result = None
+        self.max_puzzle_count = 5
+        self.choose_option_cats = CatStore()
+        self.chosen_cat = None
+        self.choose_cat_id = None
+        self.choose_type = self.generator.choose_type
+
+        for cat_id in range(1, 5):
+            self.choose_option_cats.add(cat_id, 60, 60)
+
+    def set_size(self, width, height):
+        old_width, old_height = self.width, self.height
+        if (width, height) == (old_width, old_height):
+            return
+
+        self.width = width
+        self.height = height
+        self.layout_choose_option_cats()
+
+        if self.puzzle is not None and old_width > 0 and old_height > 0:
+            self.relayout_cats(old_width, old_height)
+
+    def layout_choose_option_cats(self):
+        x_pad = self.width // 10
+        x_step = (self.width - 2 * x_pad) // 4
+        x = x_pad
+        y = 30
+
+        for cat in self.choose_option_cats:
+            cat.x = x + x_pad
+            cat.y = y
+            x += x_step
+
+    def is_playing(self):
+        return self.state == GameState.PLAYING
+
+    def is_running(self):
+        return self.countdown is not None
+
+    def get_remaining(self):
+        # Seconds left to the current countdown, with sub-second precision.
+        if self.countdown is None:
+            return 0.0
+
+        return self.countdown.get_remaining()
+
+    def motion(self, x, y):
+        # Returns True when the scene needs to be repainted.
+        if not self.is_playing():
+            return False
+
+        if self.level_data["type"] == GameType.DIVIDED_SCREEN:
+            if self.selected_cat is not None:
+                self.move_selected_cat(x, y)
+                return True
+
+            self.over_cat = self.cats.pick(x, y)
+
+        elif self.level_data["type"] == GameType.ROWS:
+            if x <= self.width // 2 - self.line_width // 2:
+                new_option = self.sides[0]
+
+            elif x >= self.width // 2 + self.line_width // 2:
+                new_option = self.sides[1]
+
+            else:
+                new_option = None
+
+            if new_option != self.over_option:
+                self.over_option = new_option
+                return True
+
+        elif self.level_data["type"] == GameType.CHOOSE:
+            chosen_cat = None
+            for cat in self.choose_option_cats:
+                if x > cat.x and x < (cat.x + cat.width) and y > cat.y and y < (cat.y + cat.height):
+                    chosen_cat = cat
+
+            if chosen_cat != self.chosen_cat:
+                self.chosen_cat = chosen_cat
+                return True
+
+        return False
+
+    def move_selected_cat(self, pointer_x, pointer_y):
+        cat = self.selected_cat
+        cat.dragged = True
+
+        width = cat.width
+        height = cat.height
+        x = pointer_x - width // 2
+        y = pointer_y - height // 2
+
+        left_limit = self.width // 2 - self.line_width // 2
+        right_limit = self.width // 2 + self.line_width // 2
+
+        if x < 0:
+            x = 0
+
+        elif x + width > self.width:
+            x = self.width - width
+
+        if y < 0:
+            y = 0
+
+        elif y + height > self.height - 25:
+            y = self.height - height - 25
+
+        if x < left_limit and x + width > left_limit and self.clicked[0] < self.width // 2:
+            x = left_limit - width
+
+        elif x + width > right_limit and x < right_limit and self.clicked[0] > self.width // 2:
+            x = right_limit
+
+        cat.x = x
+        cat.y = y
+        self.cats.update(cat)
+        self.update_misplaced(cat)
+        self.clicked = [pointer_x, pointer_y]
+
+    def press(self, x, y):
+        self.clicked = [x, y]
+        if not self.is_playing():
+            return False
+
+        if self.level_data["type"] == GameType.DIVIDED_SCREEN:
+            if self.over_cat is not None:
+                self.selected_cat = self.over_cat
+                self.bring_to_front(self.selected_cat)
+                return True
+
+        elif self.level_data["type"] == GameType.ROWS:
+            self.selected_option = self.over_option
+
+        elif self.level_data["type"] == GameType.CHOOSE:
+            self.selected_option = self.chosen_cat
+
+        return False
+
+    def release(self, x, y):
+        self.clicked = []
+        self.selected_cat = None
+        if not self.is_playing():
+            return False
+
+        if self.level_data["type"] in (GameType.ROWS, GameType.CHOOSE):
+            if self.selected_option is not None:
+                self.reaction_time = self.countdown.get_seconds_left()
+                self.reaction_time_ms = self.countdown.get_elapsed_ms()
+                self.cancel_timeout()
+                self.end_round()
+                self.notify_changed()
+                return True
+
+        return False
+
+    def build_cats(self, puzzle):
+        cats = CatStore()
+        for cat_id in puzzle.cat_ids:
+            cats.add(cat_id, puzzle.cat_size, puzzle.cat_size)
+
+        self.place_cats(puzzle, cats)
+        return cats
+
+    def place_cats(self, puzzle, cats):
+        size = (self.width, self.height)
+        layout = puzzle.layouts.get(size)
+        if layout is None:
+            layout = get_positions(puzzle, self.width, self.height, self.line_width)
+            puzzle.layouts[size] = layout
+
+        cats.set_positions(*layout)
+
+    def apply_puzzle(self, puzzle, cats=None, size=None):
+        self.puzzle = puzzle
+        self.sides = list(puzzle.sides)
+        self.choose_cat_id = puzzle.choose_cat_id
+
+        if cats is None:
+            cats = self.build_cats(puzzle)
+
+        elif size != (self.width, self.height):
+            self.place_cats(puzzle, cats)
+
+        self.puzzle_cats = cats
+
+        # The first cat generated is the topmost one. Only DIVIDED_SCREEN
+        # cats are picked and moved, grid levels need no spatial index.
+        self.cats.set_store(self.puzzle_cats,
+                            puzzle.level_type == GameType.DIVIDED_SCREEN)
+        self.count_cats()
+
+    def relayout_cats(self, old_width, old_height):
+        # Called when the allocation changes mid-round: the cats keep their
+        # state and, on DIVIDED_SCREEN, the side and relative place the
+        # player left them at.
+        store = self.puzzle_cats
+        if self.puzzle.level_type == GameType.DIVIDED_SCREEN:
+            line_width = self.line_width
+            xs = array("d")
+            ys = array("d")
+            for x, y, size in zip(store.xs, store.ys, store.widths):
+                x, y = denormalize_position(
+                    normalize_position(x, y, size, old_width, old_height, line_width),
+                    size, self.width, self.height, line_width)
+                xs.append(x)
+                ys.append(y)
+
+            store.set_positions(xs, ys)
+        else:
+            self.place_cats(self.puzzle, store)
+
+        self.cats.update_all()
+        if self.level_data:
+            self.count_cats()
+
+    def prepare_round(self, level):
+        level_data = self.get_level_data(level)
+        with self.profiler.measure("puzzle_generation"):
+            puzzle = self.generator.next_puzzle(level, level_data, self.width, self.height)
+            cats = self.build_cats(puzzle)
+
+        return (level, puzzle, cats, (self.width, self.height))
+
+    def prefetch_next_round(self):
+        # The next round is built when a countdown starts, so starting it
+        # only has to swap the prepared cats in. It is built right away,
+        # not from an idle callback, so it always uses the generator and
+        # the size of that moment and a replay builds the same puzzle.
+        self.next_round = self.prepare_round(self.get_next_level())
+        if self.prefetch_cb is not None:
+            self.prefetch_cb(self.next_round[1])
+
+    def load_level_data(self):
+        self.level_data = self.get_level_data(self.level)
+
+    def get_level_data(self, level):
+        # max_cats comes from the device probe, which measures dragging
+        # DIVIDED_SCREEN cats; those levels are played with fewer cats when
+        # the device can't drag them all smoothly. The count of ROWS and
+        # CHOOSE levels is part of their answer and is never changed.
+        level_data = self.levels[level]
+        if (level_data["type"] == GameType.DIVIDED_SCREEN and
+                self.max_cats is not None and level_data["cats"] > self.max_cats):
+            level_data["cats"] = self.max_cats
+
+        return level_data
+
+    def get_next_level(self):
+        level = self.level
+        if self.win:
+            level = self.level + 1
+
+        if level > len(self.levels):
+            level = 1
+
+        return level
+
+    def get_next_level_data(self):
+        return self.get_level_data(self.get_next_level())
+
+    def generate_score(self, reaction_time):
+        score = self.score
+        if self.win:
+            score = self.score + reaction_time + 20
+        return score
+
+    def bring_to_front(self, cat):
+        self.cats.raise_to_top(cat)
+
+    def is_misplaced(self, cat):
+        odd = self.cats_count[cat.cat_id] % 2 != 0
+        left_is_odd = self.sides[0] == SideType.ODD
+
+        if cat.x < self.width // 2:
+            return odd != left_is_odd
+
+        if cat.x > self.width // 2:
+            return odd == left_is_odd
+
+        return False
+
+    def update_misplaced(self, cat):
+        # misplaced_cats holds store rows.
+        if self.is_misplaced(cat):
+            self.misplaced_cats.add(cat.index)
+        else:
+            self.misplaced_cats.discard(cat.index)
+
+    def count_cats(self):
+        # Kept up to date while dragging, so evaluating a DIVIDED_SCREEN
+        # round doesn't need to look at every cat again.
+        store = self.puzzle_cats
+        self.cats_count = store.count_ids()
+        self.misplaced_cats = set()
+        if self.level_data["type"] != GameType.DIVIDED_SCREEN:
+            return
+
+        middle = self.width // 2
+        left_is_odd = self.sides[0] == SideType.ODD
+        odd_ids = set(cat_id for cat_id, count in self.cats_count.items() if count % 2 != 0)
+
+        for index, cat_id, x in zip(range(len(store)), store.ids, store.xs):
+            odd = cat_id in odd_ids
+            if (x < middle and odd != left_is_odd) or (x > middle and odd == left_is_odd):
+                self.misplaced_cats.add(index)
+
+    def get_cats_left(self):
+        return len(self.misplaced_cats)
+
+    def evaluate_round(self):
+        if self.level_data["type"] == GameType.DIVIDED_SCREEN:
+            correctly_placed = not self.misplaced_cats
+            self.win = correctly_placed
+            if correctly_placed:
+                self.result = RoundResult.PLACED_CORRECTLY
+            else:
+                self.result = RoundResult.PLACED_WRONG
+
+        elif self.level_data["type"] == GameType.ROWS:
+            odd = (len(self.cats) % 2) != 0
+            if self.selected_option == int(odd):
+                self.result = RoundResult.SELECTED_CORRECTLY
+                self.win = True
+
+            elif self.selected_option is not None:
+                self.result = RoundResult.SELECTED_WRONG
+                self.win = False
+
+            else:
+                self.result = RoundResult.NOT_SELECTED
+                self.win = False
+
+        elif self.level_data["type"] == GameType.CHOOSE:
+            if self.selected_option is not None:
+                if self.selected_option.cat_id == self.choose_cat_id:
+                    self.result = RoundResult.CHOSE_CORRECTLY
+                    self.win = True
+                else:
+                    self.result = RoundResult.CHOSE_WRONG
+                    self.win = False
+
+            else:
+                self.result = RoundResult.NOT_CHOSEN
+                self.win = False
+
+    def end_round(self):
+        score = self.score
+        self.evaluate_round()
+        self.score = self.generate_score(self.reaction_time)
+        self.selected_cat = None
+        self.over_cat = None
+
+        if self.puzzle_count < self.max_puzzle_count:
+            self.state = GameState.ROUND_END
+            self.start_timeout(3, self.reset)
+            self.prefetch_next_round()
+
+        else:
+            self.game_over()
+
+        if self.round_log is not None:
+            self.round_log.record(self.level, self.level_data["type"],
+                                  len(self.puzzle_cats), self.win,
+                                  self.reaction_time_ms, self.score - score)
+
+    def game_over(self):
+        if not self.win:
+            self.score -= 20
+
+        self.state = GameState.GAME_OVER
+        self.highscores.submit(self.score)
+        self.highscore = self.highscores.highscore
+
+    def reset(self):
+        self.reaction_time = 0
+        self.reaction_time_ms = None
+        self.puzzle_count += 1
+        self.level = self.get_next_level()
+        self.load_level_data()
+
+        next_round = self.next_round
+        self.next_round = None
+        if next_round is not None and next_round[0] != self.level:
+            next_round = None
+
+        self.setup_puzzle(next_round)
+        self.start_timeout(15, self.end_round)
+
+    def setup_puzzle(self, prepared_round=None):
+        self.selected_cat = None
+        self.over_cat = None
+        self.selected_option = None
+        self.over_option = None
+
+        if prepared_round is not None:
+            level, puzzle, cats, size = prepared_round
+            self.apply_puzzle(puzzle, cats, size)
+        else:
+            with self.profiler.measure("puzzle_generation"):
+                self.apply_puzzle(self.generator.next_puzzle(
+                    self.level, self.level_data, self.width, self.height))
+
+        if self.level_data["type"] == GameType.CHOOSE:
+            self.chosen_cat = None
+            self.layout_choose_option_cats()
+
+        self.state = GameState.PLAYING
+
+    def start(self):
+        self.max_cats = self.next_max_cats
+        self.win = True
+        self.puzzle_count = 0
+        self.level = 1
+        self.score = 0
+        self.cats.clear()
+        self.state = GameState.COUNTDOWN
+        self.start_timeout(5, self.reset, True)
+
+        # One puzzle per level a game can reach is ready before the first
+        # round starts.
+        self.generator.clear()
+        levels = range(1, min(len(self.levels), self.max_puzzle_count + 2) + 1)
+        self.generator.pregenerate([(level, self.get_level_data(level)) for level in levels],
+                                   1, self.width, self.height)
+        self.prefetch_next_round()
+
+    def stop(self):
+        self.cancel_timeout()
+        self.state = GameState.WELCOME
+        self.cats.clear()
+        self.next_round = None
+        self.count = None
+        self.highscores.flush()
+        self.notify_changed()
+
+    def tick(self, seconds=1.0):
+        # Only for headless engines: moves the manual clock forward.
+        self.clock.advance(seconds)
+        self.timers.poll()
+        return self.countdown is not None
+
+    def start_timeout(self, time, callback=None, force=False):
+        if self.countdown is not None and not force:
+            return
+
+        self.cancel_timeout()
+        self.count = time
+
+        def done_cb():
+            self.countdown = None
+            self.count = None
+            if callback is not None:
+                callback()
+
+            self.notify_changed()
+
+        self.countdown = self.timers.start(time, done_cb, self.__countdown_tick_cb)
+
+    def __countdown_tick_cb(self, seconds_left):
+        self.count = seconds_left
+        self.notify_changed()
+
+    def cancel_timeout(self):
+        if self.countdown is not None:
+            self.countdown.cancel()
+
+        self.countdown = None
+
+    def notify_changed(self):
+        if self.changed_cb is not None:
+            self.changed_cb()
@@ -20,72 +20,30 @@
 
 import logging
 import os
-import json
-import random
-
-from gettext import gettext as _
 
 import gi
 gi.require_version("Gtk", "3.0")
 
 from gi.repository import Gtk
 from gi.repository import Gdk
-from gi.repository import Gio
+from gi.repository import GLib
 from gi.repository import GObject
-from gi.repository import GdkPixbuf
 
 from sugar3.activity.activity import get_activity_root
 
-
-class SideType:
-    EVEN = 0
-    ODD = 1
-
-
-class GameType:
-    DIVIDED_SCREEN = 0
-    ROWS = 1
-    CHOOSE = 2
-
-
-def make_cat_pixbuf(cat_id):
-    img_path = os.path.join(os.path.dirname(os.path.realpath(__file__)),
-        "images/cat" + str(cat_id) + ".svg")
-
-    return GdkPixbuf.Pixbuf.new_from_file(img_path)
-
-
-def get_reverse_list(list1):
-    list2 = []
-    for value in list1:
-        list2.insert(0, value)
-
-    return list2
-
-
-class Cat(object):
-
-    def __init__(self, cat_id, width, height):
-        self.cat_id = cat_id
-        self.pixbuf = make_cat_pixbuf(cat_id)
-        self.x = -100
-        self.y = -100
-        self.width = width
-        self.height = height
-        self.dragged = False
-
-        if self.width != self.pixbuf.get_width() or self.height != self.pixbuf.get_height():
-            self.pixbuf = self.pixbuf.scale_simple(self.width, self.height, GdkPixbuf.InterpType.HYPER)
-
-    def draw(self, context, x=None, y=None):
-        if x is not None:
-            self.x = x
-
-        if y is not None:
-            self.y = y
-
-        Gdk.cairo_set_source_pixbuf(context, self.pixbuf, self.x, self.y)
-        context.paint()
+from capability import CapabilityProbe
+from capability import get_device_key
+from capability import load_capabilities
+from capability import save_capabilities
+from engine import GameEngine
+from engine import GameState
+from profiler import Profiler
+from renderer import Renderer
+from renderer import get_cat_rect
+from renderer import union_rects
+from replay import InputRecorder
+from sprites import sprite_cache
+from telemetry import RoundLog
 
 
 class GameArea(Gtk.DrawingArea):
@@ -93,631 +51,224 @@ class GameArea(Gtk.DrawingArea):
     def __init__(self):
         Gtk.DrawingArea.__init__(self)
 
-        self.line_width = 10
-        self.cats = []
-        self.selected_cat = None
-        self.over_cat = None
-        self.selected_option = None
-        self.over_option = None
-        self.clicked = []
-        self.sides = [SideType.EVEN, SideType.ODD]
-        self.playing = False
-        self.timeout_id = None
-        self.count = None
-        self.reaction_time = 0
-        self.level = 1
-        self.levels = {}
-        self.level_data = {}
-        self.score = 0
-        self.puzzle_count = None
-        self.win = True
-        self.max_puzzle_count = 5
-        self.choose_option_cats = []
-        self.chosen_cat = None
-        self.choose_cat_id = None
-        self.choose_type = random.choice([0, 1])
-
-        with open("levels.json") as file:
-            self.levels = json.load(file)
-
+        self.engine = GameEngine(
+            "levels.json",
+            os.path.join(get_activity_root(), "data", "highscore"),
+            GObject.timeout_add, GObject.source_remove,
+            levels_cache_dir=os.path.join(get_activity_root(), "data", "levels"))
+        self.engine.changed_cb = self.redraw
+        self.engine.prefetch_cb = self.__prefetch_cb
+        self.engine.round_log = RoundLog(
+            os.path.join(get_activity_root(), "data", "rounds.log"))
+        self.engine.round_log.start()
+
+        # Profiling is off unless CLASSIFY_CATS_PROFILE is set or the
+        # overlay is toggled with F12; samples are saved when closing.
+        self.profiler = Profiler(enabled="CLASSIFY_CATS_PROFILE" in os.environ)
+        self.profiler.add_stats_cb("sprite_cache", sprite_cache.get_stats)
+        self.profiler.add_stats_cb("input", self.__get_input_stats)
+        self.engine.profiler = self.profiler
+        self.renderer = Renderer(self.engine, self.profiler)
+
+        # CLASSIFY_CATS_RECORD names a file where the input of the session
+        # is recorded, to be replayed later with replay.py. The recording
+        # starts with the first real allocation, so its header has the
+        # size and cat cap the game starts with.
+        self.recorder = None
+
+        self.tick_id = None
+        self.pending_motion = None
+        self.coalesced_motion_events = 0
+        self.capability_probed = False
+        self.probe = None
+        self.probe_id = None
+
+        self.set_can_focus(True)
         self.add_events(Gdk.EventMask.POINTER_MOTION_MASK |
                         Gdk.EventMask.BUTTON_RELEASE_MASK |
-                        Gdk.EventMask.BUTTON_PRESS_MASK)
+                        Gdk.EventMask.BUTTON_PRESS_MASK |
+                        Gdk.EventMask.KEY_PRESS_MASK)
 
         self.connect("motion-notify-event", self.__motion_cb)
         self.connect("button-press-event", self.__press_cb)
         self.connect("button-release-event", self.__release_cb)
         self.connect("draw", self.__draw_cb)
-
-    def __define_choose_option_cats(self):
-        alloc = self.get_allocation()
-        x_pad = alloc.width // 10
-        x_step = (alloc.width - 2 * x_pad) // 4
-        x = x_pad
-        y = 30
-
-        for cat_id in range(1, 5):
-            cat = Cat(cat_id, 60, 60)
-            cat.x = x + x_pad
-            cat.y = y
-            x += x_step
-            self.choose_option_cats.append(cat)
-
-    def __draw_cb(self, widget, context):
-        self.__draw_bg(context)
-
-        if self.playing:
-            if self.level_data["type"] == GameType.DIVIDED_SCREEN:
-                self.__draw_lines(context)
-                self.__draw_size_label(context)
-
-            elif self.level_data["type"] == GameType.ROWS:
-                self.__draw_selected_option(context)
-                self.__draw_size_label(context)
-
-            elif self.level_data["type"] == GameType.CHOOSE:
-                self.__draw_selected_option(context)
-                self.__draw_choose_options(context)
-
-            self.__draw_timeout(context)
-            self.__draw_cats(context)
-
-        elif self.cats != []:
-            self.__draw_end_message(context)
-
-        elif self.count is not None and not self.playing:
-            self.__draw_count(context)
-
-        else:
-            self.__draw_welcome_message(context)
-
-    def __motion_cb(self, widget, event):
-        alloc = self.get_allocation()
-        if self.level_data == {}:
+        self.connect("size-allocate", self.__size_allocate_cb)
+        self.connect("realize", self.__realize_cb)
+        self.connect("key-press-event", self.__key_press_cb)
+        self.connect("destroy", self.__destroy_cb)
+
+        sprite_cache.set_disk_cache_dir(
+            os.path.join(get_activity_root(), "data", "sprites"))
+
+    def __realize_cb(self, widget):
+        # The welcome screen is up, the sprites are warmed meanwhile.
+        sprite_cache.preload(scales=sorted(set([1, self.get_scale_factor()])))
+
+    def __key_press_cb(self, widget, event):
+        if event.keyval == Gdk.KEY_F12:
+            self.profiler.toggle_overlay()
+            self.redraw()
+            return True
+
+        return False
+
+    def __destroy_cb(self, widget):
+        self.__pause_probe()
+        self.engine.highscores.flush()
+        self.engine.round_log.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+        if self.profiler.enabled:
+            try:
+                self.profiler.dump(os.path.join(get_activity_root(), "data", "profile.json"))
+            except (IOError, OSError) as e:
+                logging.warning("Can't save the profile: %s", e)
+
+    def __get_input_stats(self):
+        return {"coalesced_motion_events": self.coalesced_motion_events}
+
+    def __size_allocate_cb(self, widget, alloc):
+        if (alloc.width, alloc.height) != (self.engine.width, self.engine.height):
+            self.record("a", alloc.width, alloc.height)
+
+        self.engine.set_size(alloc.width, alloc.height)
+
+        if not self.capability_probed and alloc.width > 1 and alloc.height > 1:
+            self.capability_probed = True
+            self.__probe_capability(alloc.width, alloc.height)
+
+            if "CLASSIFY_CATS_RECORD" in os.environ:
+                self.recorder = InputRecorder(os.environ["CLASSIFY_CATS_RECORD"],
+                                              self.engine.generator.seed,
+                                              alloc.width, alloc.height,
+                                              self.engine.next_max_cats)
+
+    def __probe_capability(self, width, height):
+        # The probe only runs the first time the activity gets this size on
+        # this device, one cat count per idle iteration, and only while the
+        # welcome screen is up, so it never steals frames from a game.
+        path = os.path.join(get_activity_root(), "data", "capabilities.json")
+        key = get_device_key(width, height, self.get_scale_factor())
+        result = load_capabilities(path, key)
+        if result is not None:
+            self.engine.next_max_cats = result.get("max_cats")
             return
 
-        if self.level_data["type"] == GameType.DIVIDED_SCREEN:
-            if self.selected_cat is not None:
-                self.selected_cat.dragged = True
+        def done_cb(result):
+            save_capabilities(path, key, result)
+            self.engine.next_max_cats = result["max_cats"]
+            self.probe = None
 
-                width = self.selected_cat.width
-                height = self.selected_cat.height
-                x = event.x - width // 2
-                y = event.y - height // 2
+        self.probe = CapabilityProbe(width, height, self.get_scale_factor())
+        self.probe.done_cb = done_cb
+        self.__resume_probe()
 
-                left_limit = alloc.width // 2 - self.line_width // 2
-                right_limit = alloc.width // 2 + self.line_width // 2
-                xcat = self.selected_cat.width // 2 + x
+    def __resume_probe(self):
+        if self.probe is not None and self.probe_id is None:
+            self.probe_id = GLib.idle_add(self.__probe_step, priority=GLib.PRIORITY_LOW)
 
-                if x < 0:
-                    x = 0
+    def __pause_probe(self):
+        if self.probe_id is not None:
+            GLib.source_remove(self.probe_id)
+            self.probe_id = None
 
-                elif x + width > alloc.width:
-                    x = alloc.width - width
+    def __probe_step(self):
+        if self.engine.state != GameState.WELCOME or not self.probe.step():
+            self.probe_id = None
+            return False
 
-                if y < 0:
-                    y = 0
+        return True
 
-                elif y + height > alloc.height - 25:
-                    y = alloc.height - height - 25
+    def __prefetch_cb(self, puzzle):
+        scale = self.get_scale_factor()
+        for cat_id in set(puzzle.cat_ids):
+            sprite_cache.get_surface(cat_id, puzzle.cat_size, puzzle.cat_size, scale)
 
-                if x < left_limit and x + width > left_limit and self.clicked[0] < alloc.width // 2:
-                    x = left_limit - width
+    def __draw_cb(self, widget, context):
+        alloc = self.get_allocation()
+        self.renderer.draw(context, alloc.width, alloc.height,
+                           self.get_scale_factor())
 
-                elif x + width > right_limit and x < right_limit and self.clicked[0] > alloc.width // 2:
-                    x = right_limit
+    def __motion_cb(self, widget, event):
+        # Pointer positions are only applied once per frame, from the frame
+        # clock; events arriving in between just replace the pending one.
+        if self.pending_motion is not None:
+            self.coalesced_motion_events += 1
 
-                self.selected_cat.x = x
-                self.selected_cat.y = y
-                self.clicked = [event.x, event.y]
+        self.pending_motion = (event.x, event.y)
 
-                self.redraw()
+        if self.tick_id is None:
+            self.tick_id = self.add_tick_callback(self.__tick_cb)
 
-            else:
-                selected = False
-                for cat in self.cats:
-                    if event.x >= cat.x and event.x <= cat.x + cat.width and event.y >= cat.y and event.y <= cat.y + cat.height:
-                        self.over_cat = cat
-                        selected = True
-                        break
+    def __tick_cb(self, widget, frame_clock):
+        self.tick_id = None
+        with self.profiler.measure("motion"):
+            self.__flush_motion()
 
-                if not selected:
-                    self.over_cat = None
+        return False
 
-        elif self.level_data["type"] == GameType.ROWS:
-            if event.x <= alloc.width // 2 - self.line_width // 2:
-                new_option = self.sides[0]
+    def __flush_motion(self):
+        if self.pending_motion is None:
+            return
 
-            elif event.x >= alloc.width // 2 + self.line_width // 2:
-                new_option = self.sides[1]
+        x, y = self.pending_motion
+        self.pending_motion = None
+        self.record("m", x, y)
 
-            else:
-                new_option = None
+        # While dragging only the area covered by the cat before and
+        # after the move is damaged.
+        cat = self.engine.selected_cat
+        if cat is not None:
+            old_rect = get_cat_rect(cat)
 
-            if new_option != self.over_option:
-                self.over_option = new_option
-                self.redraw()
+        if not self.engine.motion(x, y):
+            return
 
-        elif self.level_data["type"] == GameType.CHOOSE:
-            flag_hover = False
-            for cat in self.choose_option_cats:
-                if event.x > cat.x and event.x < (cat.x + cat.width) and event.y > cat.y and event.y < (cat.y + cat.height):
-                    self.chosen_cat = cat
-                    flag_hover = True
-            if not flag_hover:
-                self.chosen_cat = None
+        if cat is not None and self.engine.selected_cat == cat:
+            self.redraw_area(union_rects(old_rect, get_cat_rect(cat)))
+        else:
+            self.redraw()
 
     def __press_cb(self, widget, event):
-        self.clicked = [event.x, event.y]
-        if "type" not in self.level_data.keys():
-            return 0
-        if self.level_data["type"] == GameType.DIVIDED_SCREEN:
-            if self.over_cat is not None:
-                self.selected_cat = self.over_cat
-                self.bring_to_front(self.selected_cat)
-
+        # A DrawingArea doesn't take the focus when clicked, F12 needs it.
+        self.grab_focus()
+        self.__flush_motion()
+        self.record("p", event.x, event.y)
+        with self.profiler.measure("press"):
+            if self.engine.press(event.x, event.y):
                 self.redraw()
 
-        if self.level_data["type"] == GameType.ROWS:
-            self.selected_option = self.over_option
-
-        if self.level_data["type"] == GameType.CHOOSE:
-            self.selected_option = self.chosen_cat
-
     def __release_cb(self, widget, event):
-        self.clicked = []
-        self.selected_cat = None
-        if "type" not in self.level_data.keys():
-            return 0
-        if self.level_data["type"] == GameType.ROWS or self.level_data["type"] == GameType.CHOOSE:
-            if self.selected_option is not None:
-                self.reaction_time = self.count
-                self.count = 0
+        self.__flush_motion()
+        self.record("r", event.x, event.y)
+        with self.profiler.measure("release"):
+            if self.engine.release(event.x, event.y):
                 self.redraw()
 
-    def __draw_bg(self, context):
-        alloc = self.get_allocation()
-        context.set_source_rgb(1, 1, 1)
-        context.rectangle(0, 0, alloc.width, alloc.height)
-        context.fill()
-
-    def __draw_lines(self, context):
-        alloc = self.get_allocation()
-
-        context.set_line_width(self.line_width)
-        context.set_source_rgb(0, 0, 0)
-
-        context.move_to(alloc.width // 2, 0)
-        context.line_to(alloc.width // 2, alloc.height - 25)
-        context.stroke()
-
-    def __draw_cats(self, context):
-        for cat in get_reverse_list(self.cats):
-            cat.draw(context)
-
-    def __draw_selected_option(self, context):
-        alloc = self.get_allocation()
-        if self.level_data["type"] == GameType.ROWS: 
-            width = alloc.width // 2 - self.line_width // 2
-            height = alloc.height
-
-            context.set_source_rgb(0.9, 0.9, 0.9)
-
-            if self.over_option == self.sides[0]:
-                context.rectangle(0, 0, width, height)
-                context.fill()
-
-            elif self.over_option == self.sides[1]:
-                context.rectangle(alloc.width // 2 + self.line_width // 2, 0, width, height)
-                context.fill()
-
-        elif self.level_data["type"] == GameType.CHOOSE:
-            if self.chosen_cat is not None:
-
-                width = self.chosen_cat.width + 20
-                height = self.chosen_cat.height + 20
-
-                context.set_source_rgb(0.9, 0.9, 0.9)
-                context.rectangle(self.chosen_cat.x - 10, self.chosen_cat.y -10, width, height)
-                context.fill()
-
-    def __draw_timeout(self, context):
-        alloc = self.get_allocation()
-        y = alloc.height // 2 - 5
-
-        message = "%s %d %s" % (_("You have"), self.count, _("seconds left"))
-        self.show_message(context, message, 20, y)
-
-    def __draw_bonus_message(self, context, reaction_time):
-        if reaction_time != 0 and self.win:
-            message = "%s %d" % (_("Bonus +"),self.reaction_time)
-            y = self.show_message(context, message, 30, -140) 
-
-    def __draw_current_score(self, context):	
-        if self.win:
-            message = "%s %d" % (_("Your Score: "), self.score)	
-            y = self.show_message(context, message, 40, -100)
-
-    def __draw_choose_options(self, context):
-        self.__define_choose_option_cats()
-        for cat in self.choose_option_cats:
-            cat.draw(context)
-
-    def __draw_size_label(self, context):
-        alloc = self.get_allocation()
-
-        message1 = _("Even cats")
-        message2 = _("Odd cats")
-        if self.sides[0] == SideType.ODD:
-            backup = message1
-            message1 = message2
-            message2 = backup
-
-        context.set_source_rgb(0, 0, 0)
-        context.set_font_size(20)
-
-        xb, yb, width, height, xa, ya = context.text_extents(message1)
-        y = alloc.height // 2 + height // 2
-        if self.level_data["type"] == GameType.DIVIDED_SCREEN:
-            x = alloc.width // 4 - width // 2
-        elif self.level_data["type"] == GameType.ROWS:
-            x = alloc.width // 6 - width // 2
-
-        context.move_to(x, y)
-        context.show_text(message1)
-
-        xb, yb, width, height, xa, ya = context.text_extents(message2)
-        y = alloc.height // 2 + height // 2
-        if self.level_data["type"] == GameType.DIVIDED_SCREEN:
-            x = alloc.width // 4 * 3 - width // 2
-        elif self.level_data["type"] == GameType.ROWS:
-            x = alloc.width // 6 * 5 - width // 2
-
-        context.move_to(x, y)
-        context.show_text(message2)
-
-    def __draw_count(self, context):
-        message = "%s %d %s" % (_("The game will start in"), self.count, _("seconds"))
-        y = self.show_message(context, message, 40)
-        self.__draw_help_message(context, y + 30)
-
-    def __draw_help_message(self, context, y):
-        message = ""
-        level = str(self.get_next_level())
-        next_level = self.levels[level]
-
-        if next_level["type"] == GameType.DIVIDED_SCREEN:
-            message = _("Classify each kind of cat as even or odd")
-
-        elif next_level["type"] == GameType.ROWS:
-            message = _("Is the amount of cats on the screen even or odd?")
-
-        elif next_level["type"] == GameType.CHOOSE:
-            if self.choose_type:
-                message = _("Choose the cat which has an odd count")
-            else:
-                message = _("Choose the cat which has an even count")
-
-        self.show_message(context, message, 50, y)
-
-    def __draw_end_message(self, context):
-        alloc = self.get_allocation()
-        y = -50
-
-        if self.level_data["type"] == GameType.DIVIDED_SCREEN:
-            correctly_placed = True
-            catsCount = [0]*5
-
-            for cat in self.cats:
-                catsCount[cat.cat_id-1]+=1
-
-            for cat in self.cats:
-                if self.sides[0] == SideType.ODD:
-                    if cat.x < alloc.width // 2 and catsCount[cat.cat_id-1] % 2 == 0 :
-                        correctly_placed = False
-                        break
-                    if cat.x > alloc.width // 2 and catsCount[cat.cat_id-1] % 2 != 0:
-                        correctly_placed = False
-                        break
-                else:
-                    if cat.x < alloc.width // 2 and catsCount[cat.cat_id-1] % 2 != 0:
-                        correctly_placed = False
-                        break
-                    if cat.x > alloc.width // 2 and catsCount[cat.cat_id-1] % 2 == 0:
-                        correctly_placed = False
-                        break
-
-            if correctly_placed:
-                message = _("You correctly placed the cats!")
-                self.win = True
-            else:
-                message = _("You failed to place the cats correctly")
-                self.win = False
-
-        elif self.level_data["type"] == GameType.ROWS:
-            odd = (len(self.cats) % 2) != 0
-            if self.selected_option == int(odd):
-                message = _("You selected correctly!")
-                self.win = True
-
-            elif self.selected_option != None:
-                message = _("You selected wrong")
-                self.win = False
-            else:
-                message = _("You should have selected an option")
-                self.win = False
-
-        elif self.level_data["type"] == GameType.CHOOSE:
-            if self.selected_option is not None:
-                if self.selected_option.cat_id == self.choose_cat_id:
-                    message = _("You chose correctly!")
-                    self.win = True
-                else:
-                    message = _("You chose wrong")
-                    self.win = False
-            else:
-                message = _("You should have chosen an option")
-                self.win = False
-
-        if self.puzzle_count < self.max_puzzle_count:
-            y = self.show_message(context, message, 40, y)
-
-        if self.puzzle_count < self.max_puzzle_count:
-            self.start_timeout(3, self.reset)
-            message = "%s %d %s" % (_("The game will restart in"), self.count, _("seconds"))
-            y = self.show_message(context, message, 30, y + 40)
-
-            self.__draw_help_message(context, y + 60)
-            self.__draw_current_score(context)
-            self.__draw_bonus_message(context, self.reaction_time)
-
-        if self.puzzle_count >= self.max_puzzle_count:
-            self.__draw_gameover(context)
-
-    def __draw_welcome_message(self, context):
-        message = _("Click on the star to start the game.")
-        y = self.show_message(context, message, 64)
-
-        message = _("(And click the star again to stop it)")
-        self.show_message(context, message, 24, y)
-
-    def __draw_gameover(self, context):
-        if not self.win and self.puzzle_count == self.max_puzzle_count:
-            score = self.score - 20
-        else:
-            score = self.score
-        self.playing = False
-        self.score = score
-        self.save_highscore()
-        message = _("Game Over")
-        self.show_message(context, message, 124, -100)
-        your_score = "%s %d" % (_("Your Score:"), score)
-        self.show_message(context, your_score, 60, 50)
-        high_score = "%s %d" % (_("High Score:"), self.load_highscore())
-        self.show_message(context, high_score, 60, 150)
-        message = _("Click on the star to start the game.")
-        self.show_message(context, message, 30, 250)
-        self.win = True
-        self.puzzle_count += 1
-    def show_message(self, context, message, font_size, y=0):
-        alloc = self.get_allocation()
-
-        context.set_font_size(font_size)
-        xb, yb, width, height, xa, ya = context.text_extents(message)
-
-        if width <= alloc.width:
-            context.set_source_rgb(0, 0, 0)
-            context.move_to(alloc.width // 2 - width // 2, alloc.height // 2 + y)
-            context.show_text(message)
-
-            return y + height
-
-        else:
-            return self.show_message(context, message, font_size - 5, y)
-
-    def divide_into_even_odd(self, number):
-        self.choose_cat_id = random.choice(list(range(1, 5)))
-        divided_nums = []
-        flatten_nums = []
-        if self.choose_type:
-            remaining_sum = number - 1
-        else:
-            remaining_sum = number - 3
-
-        for i in range(3):
-            even_number = random.randrange(0, remaining_sum - (3 - i) * 2 + 2, 2)
-            divided_nums.append(even_number)
-            remaining_sum -= even_number
-        divided_nums.append(remaining_sum)
-
-        if self.choose_type:
-            divided_nums[self.choose_cat_id - 1] += 1
-        else:
-            for i in range(0, 4):
-                if (i + 1) != self.choose_cat_id:
-                    divided_nums[i] += 1
-
-        for i in range(4):
-            for j in range(divided_nums[i]):
-                flatten_nums.append(i + 1)
-        random.shuffle(flatten_nums)
-        return flatten_nums
-
-    def add_cats(self):
-        alloc = self.get_allocation()
-        cat_ids = list(range(1, 5))
-        cats = self.level_data["cats"]
-        cats_in_row = 0
-        column = 0
-        space = 50
-        y = -1
-
-        cat_width = 120
-        cat_height = 120
-
-        if self.level_data["type"] == GameType.ROWS:
-            cat_width = 60
-            cat_height = 60
-
-        elif self.level_data["type"] == GameType.CHOOSE:
-            choose_cat_ids = self.divide_into_even_odd(cats)
-            cat_width = 60
-            cat_height = 60
-
-        for x in range(cats):
-            if self.level_data["type"] == GameType.DIVIDED_SCREEN:
-                cat_id = random.choice(cat_ids)
-                cat = Cat(cat_id, cat_width, cat_height)
-                while cat.x < 0 or cat.x + cat.width > alloc.width or (cat.x < alloc.width // 2 and cat.x + cat.width > alloc.width // 2):
-                    cat.x = random.randint(0, alloc.width - cat.width)
-
-                while cat.y < 0 or cat.y + cat.height > alloc.height - 20:
-                    cat.y = random.randint(0, alloc.height - cat.height - 25)
-
-            elif self.level_data["type"] == GameType.ROWS:
-                cat_id = random.choice(cat_ids)
-                cat = Cat(cat_id, cat_width, cat_height)
-                if column == cats_in_row:
-                    m = 4 if cats_in_row == 5 else 5
-                    cats_in_row = min(m, cats - x)
-                    column = 0
-                    y += 1
-
-                cat.x = alloc.width // 2 - cats_in_row * (cat.width + space) // 2.0 + (cat.width + space) * column + space // 2
-                cat.y = y
-                column += 1
-
-            elif self.level_data["type"] == GameType.CHOOSE:
-                cat_id = choose_cat_ids[x]
-                cat = Cat(cat_id, cat_width, cat_height)
-                if column == cats_in_row:
-                    m = 4 if cats_in_row == 5 else 5
-                    cats_in_row = min(m, cats - x)
-                    column = 0
-                    y += 1
- 
-                cat.x = alloc.width // 2 - cats_in_row * (cat.width + space) // 2.0 + (cat.width + space) * column + space // 2
-                cat.y = y
-                column += 1
-            self.cats.append(cat)
-
-        if self.level_data["type"] == GameType.ROWS:
-            for cat in self.cats:
-                cat.y = alloc.height // 2 - cat.height * (column - cat.y)
-
-        elif self.level_data["type"] == GameType.CHOOSE:
-            for cat in self.cats:
-                cat.y = alloc.height // 2 - cat.height * (column - cat.y)
-
-    def load_level_data(self):
-        self.level_data = self.levels[str(self.level)]
-
-    def get_next_level(self):
-        level = self.level
-        if self.win:
-            level = self.level + 1
-        
-        if level > len(list(self.levels.keys())):
-            level = 1
-
-        return level
-
-    def generate_score(self, reaction_time):
-        score = self.score
-        if self.win:
-            score = self.score + reaction_time + 20
-        return score
-
-    def bring_to_front(self, cat):
-        self.cats.remove(cat)
-        self.cats.insert(0, cat)
-
-    def reset(self):
-        def cb():
-            self.score = self.generate_score(self.reaction_time)
-            self.playing = False
-
-        self.reaction_time = 0
-        self.puzzle_count += 1
-        self.level = self.get_next_level()
-        self.load_level_data()
-
-        if self.level_data["type"] == GameType.DIVIDED_SCREEN:
-            random.shuffle(self.sides)
-
-        del self.cats
-        self.cats = []
-        self.add_cats()
-        self.playing = True
-
-        self.start_timeout(15, cb)
-
     def start(self):
-        self.win = True
-        self.puzzle_count = 0
-        self.level = 1
-        self.score = 0
-        self.cats = []
-        self.start_timeout(5, self.reset, True)
-
-    def stop(self):
-        if self.timeout_id is not None:
-            GObject.source_remove(self.timeout_id)
-            self.timeout_id = None
-
-        self.playing = False
-        del self.cats
-        self.cats = []
-        self.count = None
+        # The cap this game is played with, it changes the puzzles.
+        self.__pause_probe()
+        self.record("s", self.engine.next_max_cats or 0)
+        self.engine.start()
         self.redraw()
 
-    def timeout_cb(self, callback=None):
-        self.count -= 1
-        self.redraw()
-
-        end = self.count <= 0
-        self.count = self.count if not end else None
-        self.timeout_id = self.timeout_id if not end else None
-
-        if end and callback is not None:
-            callback()
-
-        return not end
-
-    def start_timeout(self, time, callback=None, force=False):
-        if self.timeout_id is not None and not force:
-            return
+    def stop(self):
+        self.record("x")
+        self.engine.stop()
+        self.__resume_probe()
 
-        elif self.timeout_id is not None and force:
-            GObject.source_remove(self.timeout_id)
+    def record(self, kind, *args):
+        if self.recorder is not None:
+            self.recorder.record(kind, *args)
 
-        self.count = time + 1
-        self.timeout_cb()
-        self.timeout_id = GObject.timeout_add(1000, self.timeout_cb, callback)
+    def is_running(self):
+        return self.engine.is_running()
 
     def redraw(self):
-        GObject.idle_add(self.queue_draw)
-
-    def read_highscore(self):
-        highscore = [0]
-        file_path = os.path.join(get_activity_root(), 'data', 'highscore')
-        if os.path.exists(file_path):
-            with open(file_path, "r") as fp:
-                highscore = fp.readlines()
-        return int(highscore[0])
-
-    def save_highscore(self):
-        file_path = os.path.join(get_activity_root(), 'data', 'highscore')
-        int_highscore = self.read_highscore()
-        if not int_highscore > self.score:
-            with open(file_path, "w") as fp:
-                fp.write(str(self.score))
-
-    def load_highscore(self):
-        highscore = self.read_highscore()
-        try:
-            return highscore
-        except (ValueError, IndexError) as e:
-            logging.exception(e)
-            return 0
-        return 0
+        # queue_draw is already painted at most once per frame clock cycle.
+        self.queue_draw()
+
+    def redraw_area(self, rect):
+        self.queue_draw_area(*rect)
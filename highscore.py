@@ -0,0 +1,97 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import logging
+import os
+
+
+class HighscoreStore(object):
+
+    # The highscore is read once and then served from memory. Changes are
+    # written back after a short delay, at most once per burst, to a
+    # temporary file renamed over the old one, so an interrupted write
+    # leaves the previous score in place.
+
+    def __init__(self, path=None, timeout_add=None, source_remove=None, delay=1000):
+        self.path = path
+        self.timeout_add = timeout_add
+        self.source_remove = source_remove
+        self.delay = delay
+        self.highscore = 0
+        self.dirty = False
+        self.source_id = None
+
+    def load(self):
+        self.highscore = 0
+        if self.path is None or not os.path.exists(self.path):
+            return self.highscore
+
+        try:
+            with open(self.path, "r") as fp:
+                self.highscore = int(fp.read().split()[0])
+
+        except (IOError, OSError, ValueError, IndexError) as e:
+            logging.warning("Can't read the highscore from %s: %s", self.path, e)
+
+        return self.highscore
+
+    def submit(self, score):
+        # Returns True when score is the new highscore.
+        if score < self.highscore:
+            return False
+
+        self.highscore = score
+        self.dirty = True
+        self.schedule_save()
+        return True
+
+    def schedule_save(self):
+        if self.timeout_add is None:
+            self.save()
+
+        elif self.source_id is None:
+            self.source_id = self.timeout_add(self.delay, self.__save_timeout_cb)
+
+    def __save_timeout_cb(self):
+        self.source_id = None
+        self.save()
+        return False
+
+    def save(self):
+        if not self.dirty or self.path is None:
+            return
+
+        self.dirty = False
+        tmp_path = self.path + ".tmp"
+        try:
+            with open(tmp_path, "w") as fp:
+                fp.write(str(self.highscore))
+                fp.flush()
+                os.fsync(fp.fileno())
+
+            os.rename(tmp_path, self.path)
+
+        except (IOError, OSError) as e:
+            logging.warning("Can't save the highscore to %s: %s", self.path, e)
+
+    def flush(self):
+        if self.source_id is not None and self.source_remove is not None:
+            self.source_remove(self.source_id)
+
+        self.source_id = None
+        self.save()
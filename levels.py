@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+# A level pack is either a JSON object mapping "1", "2"... to
+# {"type": <GameType>, "cats": <count>}, like levels.json, or a JSON lines
+# file with one such object per level, meant for big generated packs.
+
+import hashlib
+import json
+import logging
+import os
+import struct
+
+from array import array
+
+from puzzles import GameType
+
+
+ACTIVITY_DIR = os.path.dirname(os.path.realpath(__file__))
+
+CACHE_VERSION = 1
+CACHE_HEADER = struct.Struct("<4sBI")
+CACHE_MAGIC = b"CCLP"
+
+GAME_TYPES = (GameType.DIVIDED_SCREEN, GameType.ROWS, GameType.CHOOSE)
+MAX_CATS = 65535
+
+# divide_into_even_odd needs at least this many cats, and an odd count
+# for exactly one kind of cat to have a different parity.
+MIN_CHOOSE_CATS = 9
+
+
+class LevelPackError(ValueError):
+    pass
+
+
+class LevelPack(object):
+
+    # Levels are validated once and compiled into two columns indexed by
+    # level - 1. The compiled table is cached in cache_dir, so later
+    # launches don't parse any JSON. JSON lines packs are read one line at
+    # a time, so only the table stays in memory, never the whole document.
+
+    def __init__(self, path, cache_dir=None):
+        if not os.path.isabs(path):
+            path = os.path.join(ACTIVITY_DIR, path)
+
+        self.path = path
+        self.cache_dir = cache_dir
+        self.types = array("B")
+        self.cats = array("H")
+        self.count = 0
+
+        self.load()
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, level):
+        return 1 <= int(level) <= self.count
+
+    def __getitem__(self, level):
+        level = int(level)
+        if not 1 <= level <= self.count:
+            raise KeyError(level)
+
+        return {"type": self.types[level - 1], "cats": self.cats[level - 1]}
+
+    def items(self, start=1, stop=None):
+        if stop is None or stop > self.count:
+            stop = self.count
+
+        for level in range(start, stop + 1):
+            yield (level, self[level])
+
+    def load(self):
+        self.types = array("B")
+        self.cats = array("H")
+
+        if self._read_cache():
+            return
+
+        if self.path.endswith(".jsonl"):
+            self._load_lines()
+        else:
+            self._load_object()
+
+        if self.count == 0:
+            raise LevelPackError("%s: the pack has no levels" % self.path)
+
+        self._write_cache()
+
+    def _load_object(self):
+        with open(self.path) as file:
+            data = json.load(file)
+
+        if not isinstance(data, dict):
+            raise LevelPackError("%s: expected an object of levels" % self.path)
+
+        self.count = len(data)
+        for level in range(1, self.count + 1):
+            if str(level) not in data:
+                raise LevelPackError("%s: level %d is missing" % (self.path, level))
+
+            self._append(level, data[str(level)])
+
+    def _append(self, level, level_data):
+        if not isinstance(level_data, dict):
+            raise LevelPackError("%s: level %d is not an object" % (self.path, level))
+
+        level_type = level_data.get("type")
+        cats = level_data.get("cats")
+
+        if level_type not in GAME_TYPES or isinstance(level_type, bool):
+            raise LevelPackError("%s: level %d has an unknown type %r" %
+                                 (self.path, level, level_type))
+
+        if not isinstance(cats, int) or isinstance(cats, bool) or not 1 <= cats <= MAX_CATS:
+            raise LevelPackError("%s: level %d has an invalid cat count %r" %
+                                 (self.path, level, cats))
+
+        if level_type == GameType.CHOOSE and (cats < MIN_CHOOSE_CATS or cats % 2 == 0):
+            raise LevelPackError("%s: level %d needs an odd count of at least %d cats" %
+                                 (self.path, level, MIN_CHOOSE_CATS))
+
+        self.types.append(level_type)
+        self.cats.append(cats)
+
+    def _load_lines(self):
+        # A bad line is reported when the pack is loaded, not when its
+        # level is reached in the middle of a game.
+        with open(self.path, "r") as file:
+            for line in file:
+                if not line.strip():
+                    continue
+
+                level = len(self.types) + 1
+                try:
+                    level_data = json.loads(line)
+                except ValueError as e:
+                    raise LevelPackError("%s: level %d: %s" % (self.path, level, e))
+
+                self._append(level, level_data)
+
+        self.count = len(self.types)
+
+    def _get_cache_path(self):
+        if self.cache_dir is None:
+            return None
+
+        info = os.stat(self.path)
+        key = "%s-%d-%d" % (self.path, info.st_mtime_ns, info.st_size)
+        stamp = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+        name = "%s-v%d-%s.bin" % (os.path.basename(self.path), CACHE_VERSION, stamp)
+        return os.path.join(self.cache_dir, name)
+
+    def _read_cache(self):
+        path = self._get_cache_path()
+        if path is None or not os.path.exists(path):
+            return False
+
+        try:
+            with open(path, "rb") as file:
+                magic, version, count = CACHE_HEADER.unpack(file.read(CACHE_HEADER.size))
+                if magic != CACHE_MAGIC or version != CACHE_VERSION or count == 0:
+                    return False
+
+                self.types.fromfile(file, count)
+                self.cats.fromfile(file, count)
+
+        except (IOError, OSError, EOFError, struct.error) as e:
+            logging.warning("Can't read the level cache %s: %s", path, e)
+            self.types = array("B")
+            self.cats = array("H")
+            return False
+
+        self.count = count
+        return True
+
+    def _write_cache(self):
+        path = self._get_cache_path()
+        if path is None:
+            return
+
+        prefix = os.path.basename(self.path) + "-"
+        tmp_path = path + ".tmp"
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+
+            with open(tmp_path, "wb") as file:
+                file.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, self.count))
+                self.types.tofile(file)
+                self.cats.tofile(file)
+
+            os.rename(tmp_path, path)
+
+            # Tables compiled from older versions of the pack are dropped.
+            for name in os.listdir(self.cache_dir):
+                old_path = os.path.join(self.cache_dir, name)
+                if name.startswith(prefix) and name.endswith(".bin") and old_path != path:
+                    os.remove(old_path)
+
+        except (IOError, OSError) as e:
+            logging.warning("Can't write the level cache %s: %s", path, e)
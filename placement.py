@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import random
+
+
+def get_grid_cells(x, y, width, height, cat_width, cat_height, gap):
+    # Splits the area into cells at least one cat plus the gap wide, the
+    # last column and row don't need the trailing gap. Every cell is
+    # returned as (x, y, horizontal slack, vertical slack).
+    columns = int((width + gap) // (cat_width + gap))
+    rows = int((height + gap) // (cat_height + gap))
+    if columns <= 0 or rows <= 0:
+        return []
+
+    x_step = (width + gap) / float(columns)
+    y_step = (height + gap) / float(rows)
+    x_slack = x_step - gap - cat_width
+    y_slack = y_step - gap - cat_height
+
+    cells = []
+    for column in range(columns):
+        for row in range(rows):
+            cells.append((x + column * x_step, y + row * y_step, x_slack, y_slack))
+
+    return cells
+
+
+def place_in_halves(count, width, height, cat_width, cat_height,
+                    line_width, bottom_margin=25, gap=10, rng=random):
+    # Places count cats on both sides of the divider using jittered grid
+    # sampling: every cat gets its own cell, so cats never overlap and the
+    # time spent is bounded by the number of cells. Returns the list of
+    # (x, y) positions and whether all the cats fitted without overlaps;
+    # the cats that don't fit are placed at random on either side.
+    half_width = width // 2 - line_width // 2
+    area_height = height - bottom_margin
+    right_x = width // 2 + line_width // 2
+
+    cells = get_grid_cells(0, 0, half_width, area_height, cat_width, cat_height, gap)
+    cells += get_grid_cells(right_x, 0, width - right_x, area_height, cat_width, cat_height, gap)
+    rng.shuffle(cells)
+
+    positions = []
+    for x, y, x_slack, y_slack in cells[:count]:
+        positions.append((int(x + rng.uniform(0, x_slack)),
+                          int(y + rng.uniform(0, y_slack))))
+
+    fits = len(positions) == count
+    while len(positions) < count:
+        if rng.random() < 0.5:
+            x = rng.uniform(0, max(0, half_width - cat_width))
+        else:
+            x = right_x + rng.uniform(0, max(0, width - right_x - cat_width))
+
+        y = rng.uniform(0, max(0, area_height - cat_height))
+        positions.append((int(x), int(y)))
+
+    return positions, fits
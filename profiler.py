@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import json
+import os
+import time
+
+from collections import deque
+
+
+class _Measure(object):
+
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        self.profiler.record(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+class _NullMeasure(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_null_measure = _NullMeasure()
+
+
+class Profiler(object):
+
+    # Keeps the last samples (in milliseconds) of every measured hot path
+    # in fixed size ring buffers. While disabled, measuring costs a method
+    # call and nothing is recorded.
+
+    def __init__(self, size=240, enabled=False):
+        self.size = size
+        self.enabled = enabled
+        self.overlay_visible = False
+        self.samples = {}
+        self.stats_cbs = {}
+
+    def measure(self, name):
+        if not self.enabled:
+            return _null_measure
+
+        return _Measure(self, name)
+
+    def record(self, name, value):
+        if not self.enabled:
+            return
+
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = deque(maxlen=self.size)
+            self.samples[name] = samples
+
+        samples.append(value)
+
+    def add_stats_cb(self, name, callback):
+        # callback() returns a dict included as is in the summary, e.g.
+        # the sprite cache counters.
+        self.stats_cbs[name] = callback
+
+    def toggle_overlay(self):
+        self.overlay_visible = not self.overlay_visible
+        if self.overlay_visible:
+            self.enabled = True
+
+    def get_summary(self):
+        summary = {}
+        for name, samples in self.samples.items():
+            if not samples:
+                continue
+
+            values = sorted(samples)
+            summary[name] = {"count": len(values),
+                             "mean_ms": sum(values) / len(values),
+                             "p95_ms": values[min(len(values) - 1, int(len(values) * 0.95))],
+                             "max_ms": values[-1]}
+
+        for name, callback in self.stats_cbs.items():
+            summary[name] = callback()
+
+        return summary
+
+    def dump(self, path):
+        if not self.samples:
+            return
+
+        data = {"time": time.time(),
+                "summary": self.get_summary(),
+                "samples": dict((name, list(samples))
+                                for name, samples in self.samples.items())}
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(data, file)
+
+        os.rename(tmp_path, path)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import logging
+import random
+
+from array import array
+from collections import deque
+
+from placement import place_in_halves
+
+
+class SideType:
+    EVEN = 0
+    ODD = 1
+
+
+class GameType:
+    DIVIDED_SCREEN = 0
+    ROWS = 1
+    CHOOSE = 2
+
+
+CAT_SIZES = {
+    GameType.DIVIDED_SCREEN: 120,
+    GameType.ROWS: 60,
+    GameType.CHOOSE: 60,
+}
+
+BOTTOM_MARGIN = 25
+GRID_SPACE = 50
+
+
+class Puzzle(object):
+
+    # Everything needed to show a round, independent of the allocation:
+    # DIVIDED_SCREEN positions are stored as the columns position_sides,
+    # fxs and fys, fx and fy being the fraction of the free space of that
+    # side; ROWS and CHOOSE cats are always laid out on a centered grid.
+    # The (xs, ys) columns computed for each allocation size are kept in
+    # layouts.
+
+    def __init__(self, level, level_type, cat_ids):
+        self.level = level
+        self.level_type = level_type
+        self.cat_ids = array("B", cat_ids)
+        self.cat_size = CAT_SIZES[level_type]
+        self.position_sides = array("B")
+        self.fxs = array("d")
+        self.fys = array("d")
+        self.sides = [SideType.EVEN, SideType.ODD]
+        self.choose_cat_id = None
+        self.fits = True
+        self.layouts = {}
+
+
+def get_side_area(side, width, height, line_width):
+    if side == 0:
+        return (0, 0, width // 2 - line_width // 2, height - BOTTOM_MARGIN)
+
+    x = width // 2 + line_width // 2
+    return (x, 0, width - x, height - BOTTOM_MARGIN)
+
+
+def normalize_position(x, y, cat_size, width, height, line_width):
+    side = 0 if x < width // 2 else 1
+    area_x, area_y, area_width, area_height = get_side_area(side, width, height, line_width)
+    fx = (x - area_x) / float(max(1, area_width - cat_size))
+    fy = (y - area_y) / float(max(1, area_height - cat_size))
+
+    return (side, min(1.0, max(0.0, fx)), min(1.0, max(0.0, fy)))
+
+
+def denormalize_position(position, cat_size, width, height, line_width):
+    side, fx, fy = position
+    area_x, area_y, area_width, area_height = get_side_area(side, width, height, line_width)
+
+    return (int(area_x + fx * max(0, area_width - cat_size)),
+            int(area_y + fy * max(0, area_height - cat_size)))
+
+
+def get_grid_positions(count, cat_size, width, height):
+    # Rows of five and four cats alternate, centered on the screen.
+    xs = array("d")
+    rows = []
+    cats_in_row = 0
+    column = 0
+    row = -1
+
+    for x in range(count):
+        if column == cats_in_row:
+            m = 4 if cats_in_row == 5 else 5
+            cats_in_row = min(m, count - x)
+            column = 0
+            row += 1
+
+        xs.append(width // 2 - cats_in_row * (cat_size + GRID_SPACE) // 2.0 + (cat_size + GRID_SPACE) * column + GRID_SPACE // 2)
+        rows.append(row)
+        column += 1
+
+    return xs, array("d", [height // 2 - cat_size * (column - row) for row in rows])
+
+
+def get_positions(puzzle, width, height, line_width):
+    # Returns the xs and ys columns of the cats for this allocation.
+    if puzzle.level_type == GameType.DIVIDED_SCREEN:
+        xs = array("d")
+        ys = array("d")
+        for position in zip(puzzle.position_sides, puzzle.fxs, puzzle.fys):
+            x, y = denormalize_position(position, puzzle.cat_size, width, height, line_width)
+            xs.append(x)
+            ys.append(y)
+
+        return xs, ys
+
+    return get_grid_positions(len(puzzle.cat_ids), puzzle.cat_size, width, height)
+
+
+class PuzzleGenerator(object):
+
+    # All the randomness of a session comes from here, so the same seed
+    # always produces the same puzzles. Puzzles can be generated ahead of
+    # time with pregenerate() and are then just popped by next_puzzle().
+
+    def __init__(self, seed=None, line_width=10, cat_gap=10):
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+
+        self.seed = seed
+        self.random = random.Random(seed)
+        self.line_width = line_width
+        self.cat_gap = cat_gap
+        self.choose_type = self.random.choice([0, 1])
+        self._queues = {}
+
+    def divide_into_even_odd(self, number):
+        choose_cat_id = self.random.choice(list(range(1, 5)))
+        divided_nums = []
+        flatten_nums = []
+        if self.choose_type:
+            remaining_sum = number - 1
+        else:
+            remaining_sum = number - 3
+
+        for i in range(3):
+            even_number = self.random.randrange(0, remaining_sum - (3 - i) * 2 + 2, 2)
+            divided_nums.append(even_number)
+            remaining_sum -= even_number
+        divided_nums.append(remaining_sum)
+
+        if self.choose_type:
+            divided_nums[choose_cat_id - 1] += 1
+        else:
+            for i in range(0, 4):
+                if (i + 1) != choose_cat_id:
+                    divided_nums[i] += 1
+
+        for i in range(4):
+            for j in range(divided_nums[i]):
+                flatten_nums.append(i + 1)
+        self.random.shuffle(flatten_nums)
+        return flatten_nums, choose_cat_id
+
+    def generate(self, level, level_data, width, height):
+        level_type = level_data["type"]
+        cats = level_data["cats"]
+
+        if level_type == GameType.CHOOSE:
+            cat_ids, choose_cat_id = self.divide_into_even_odd(cats)
+            puzzle = Puzzle(level, level_type, cat_ids)
+            puzzle.choose_cat_id = choose_cat_id
+            return puzzle
+
+        cat_ids = [self.random.choice(list(range(1, 5))) for x in range(cats)]
+        puzzle = Puzzle(level, level_type, cat_ids)
+
+        if level_type == GameType.DIVIDED_SCREEN:
+            self.random.shuffle(puzzle.sides)
+
+            positions, puzzle.fits = place_in_halves(
+                cats, width, height, puzzle.cat_size, puzzle.cat_size,
+                self.line_width, BOTTOM_MARGIN, self.cat_gap, self.random)
+
+            if not puzzle.fits:
+                logging.warning("%d cats don't fit in %dx%d without overlapping",
+                                cats, width, height)
+
+            for x, y in positions:
+                side, fx, fy = normalize_position(x, y, puzzle.cat_size, width, height, self.line_width)
+                puzzle.position_sides.append(side)
+                puzzle.fxs.append(fx)
+                puzzle.fys.append(fy)
+
+        return puzzle
+
+    def generate_batch(self, level, level_data, count, width, height):
+        return [self.generate(level, level_data, width, height) for x in range(count)]
+
+    def pregenerate(self, levels, count, width, height):
+        # levels yields (level, level_data) pairs.
+        for level, level_data in levels:
+            queue = self._queues.setdefault(str(level), deque())
+            queue.extend(self.generate_batch(level, level_data, count, width, height))
+
+    def next_puzzle(self, level, level_data, width, height):
+        queue = self._queues.get(str(level))
+        if queue:
+            return queue.popleft()
+
+        return self.generate(level, level_data, width, height)
+
+    def clear(self):
+        self._queues.clear()
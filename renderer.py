@@ -0,0 +1,397 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2016, Cristian García <cristian99garcia@gmail.com>
+#
+# This library is free software you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation either
+# version 3 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import math
+
+from gettext import gettext as _
+
+import cairo
+
+from engine import GameState
+from engine import GameType
+from engine import RoundResult
+from engine import SideType
+from profiler import Profiler
+from sprites import sprite_cache
+from textcache import TextLayoutCache
+
+
+def get_result_message(result):
+    messages = {
+        RoundResult.PLACED_CORRECTLY: _("You correctly placed the cats!"),
+        RoundResult.PLACED_WRONG: _("You failed to place the cats correctly"),
+        RoundResult.SELECTED_CORRECTLY: _("You selected correctly!"),
+        RoundResult.SELECTED_WRONG: _("You selected wrong"),
+        RoundResult.NOT_SELECTED: _("You should have selected an option"),
+        RoundResult.CHOSE_CORRECTLY: _("You chose correctly!"),
+        RoundResult.CHOSE_WRONG: _("You chose wrong"),
+        RoundResult.NOT_CHOSEN: _("You should have chosen an option"),
+    }
+
+    return messages[result]
+
+
+def get_cat_rect(cat):
+    x = int(math.floor(cat.x))
+    y = int(math.floor(cat.y))
+    width = int(math.ceil(cat.x + cat.width)) - x
+    height = int(math.ceil(cat.y + cat.height)) - y
+    return (x, y, width, height)
+
+
+def union_rects(rect1, rect2):
+    x = min(rect1[0], rect2[0])
+    y = min(rect1[1], rect2[1])
+    width = max(rect1[0] + rect1[2], rect2[0] + rect2[2]) - x
+    height = max(rect1[1] + rect1[3], rect2[1] + rect2[3]) - y
+    return (x, y, width, height)
+
+
+def draw_cat(context, cat, scale=1):
+    surface = sprite_cache.get_surface(cat.cat_id, cat.width, cat.height, scale)
+    context.set_source_surface(surface, cat.x, cat.y)
+    context.paint()
+
+
+class Renderer(object):
+
+    # Draws the state of a GameEngine on any cairo context, GameArea uses
+    # it from its draw signal and render_frame() uses it headless.
+
+    def __init__(self, engine, profiler=None):
+        self.engine = engine
+        self.profiler = profiler or Profiler()
+        self.width = 0
+        self.height = 0
+        self.scale = 1
+        self.static_layers = {}
+        self.static_layers_key = None
+        self.grid_layer = None
+        self.grid_layer_key = None
+        self.text_cache = TextLayoutCache()
+
+    def draw(self, context, width, height, scale=1):
+        if width != self.width:
+            self.text_cache.clear()
+
+        self.width = width
+        self.height = height
+        self.scale = scale
+
+        with self.profiler.measure("frame"):
+            self.__draw_frame(context)
+
+        if self.profiler.overlay_visible:
+            self.__draw_profiler_overlay(context)
+
+    def __draw_frame(self, context):
+        # Drawing only reads the engine state, it never changes it.
+        engine = self.engine
+        profiler = self.profiler
+
+        if engine.state == GameState.PLAYING:
+            with profiler.measure("draw_bg"):
+                context.set_source_surface(self.__get_static_layer(context), 0, 0)
+                context.paint()
+
+            if engine.level_data["type"] == GameType.CHOOSE:
+                with profiler.measure("draw_options"):
+                    self.__draw_selected_option(context)
+                    self.__draw_choose_options(context)
+
+            with profiler.measure("draw_text"):
+                self.__draw_timeout(context)
+
+            with profiler.measure("draw_cats"):
+                self.__draw_cats(context)
+
+            return
+
+        with profiler.measure("draw_bg"):
+            self.__draw_bg(context)
+
+        with profiler.measure("draw_text"):
+            if engine.state == GameState.ROUND_END:
+                self.__draw_end_message(context)
+
+            elif engine.state == GameState.GAME_OVER:
+                self.__draw_gameover(context)
+
+            elif engine.state == GameState.COUNTDOWN:
+                self.__draw_count(context)
+
+            else:
+                self.__draw_welcome_message(context)
+
+    def __draw_profiler_overlay(self, context):
+        lines = []
+        for name, stats in sorted(self.profiler.get_summary().items()):
+            if "mean_ms" in stats:
+                lines.append("%s: %.2f ms (p95 %.2f, max %.2f)" % (
+                    name, stats["mean_ms"], stats["p95_ms"], stats["max_ms"]))
+            else:
+                lines.append("%s: %s" % (name, ", ".join(
+                    "%s %s" % item for item in sorted(stats.items()))))
+
+        context.set_font_size(12)
+        context.set_source_rgba(0, 0, 0, 0.7)
+        context.rectangle(0, 0, 420, 16 * len(lines) + 8)
+        context.fill()
+
+        context.set_source_rgb(1, 1, 1)
+        y = 16
+        for line in lines:
+            context.move_to(6, y)
+            context.show_text(line)
+            y += 16
+
+    def __get_static_layer(self, context):
+        # The background, divider, side labels and the hovered row only
+        # change with the allocation, the level type, the side shuffle or
+        # the hovered option, so they are rendered offscreen once per state.
+        engine = self.engine
+        level_type = engine.level_data["type"]
+
+        key = (self.width, self.height, level_type, tuple(engine.sides))
+        if key != self.static_layers_key:
+            self.static_layers = {}
+            self.static_layers_key = key
+
+        over_option = None
+        if level_type == GameType.ROWS:
+            over_option = engine.over_option
+
+        surface = self.static_layers.get(over_option)
+        if surface is not None:
+            return surface
+
+        surface = context.get_target().create_similar(
+            cairo.CONTENT_COLOR, self.width, self.height)
+        layer_context = cairo.Context(surface)
+        self.__draw_bg(layer_context)
+
+        if level_type == GameType.DIVIDED_SCREEN:
+            self.__draw_lines(layer_context)
+            self.__draw_size_label(layer_context)
+
+        elif level_type == GameType.ROWS:
+            self.__draw_selected_option(layer_context)
+            self.__draw_size_label(layer_context)
+
+        self.static_layers[over_option] = surface
+        return surface
+
+    def __draw_bg(self, context):
+        x1, y1, x2, y2 = context.clip_extents()
+        context.set_source_rgb(1, 1, 1)
+        context.rectangle(x1, y1, x2 - x1, y2 - y1)
+        context.fill()
+
+    def __draw_lines(self, context):
+        context.set_line_width(self.engine.line_width)
+        context.set_source_rgb(0, 0, 0)
+
+        context.move_to(self.width // 2, 0)
+        context.line_to(self.width // 2, self.height - 25)
+        context.stroke()
+
+    def __draw_cats(self, context):
+        if self.engine.level_data["type"] in (GameType.ROWS, GameType.CHOOSE):
+            context.set_source_surface(self.__get_grid_layer(context), 0, 0)
+            context.paint()
+            return
+
+        scale = self.scale
+        x1, y1, x2, y2 = context.clip_extents()
+        for cat in self.engine.cats.query(x1, y1, x2 - x1, y2 - y1):
+            draw_cat(context, cat, scale)
+
+    def __get_grid_layer(self, context):
+        # ROWS and CHOOSE cats never move during a round, so all of them
+        # are composed once per puzzle and painted in a single operation.
+        key = (self.engine.puzzle, self.width, self.height, self.scale)
+        if key == self.grid_layer_key:
+            return self.grid_layer
+
+        surface = context.get_target().create_similar(
+            cairo.CONTENT_COLOR_ALPHA, self.width, self.height)
+        layer_context = cairo.Context(surface)
+        for cat in self.engine.cats:
+            draw_cat(layer_context, cat, self.scale)
+
+        self.grid_layer = surface
+        self.grid_layer_key = key
+        return surface
+
+    def __draw_selected_option(self, context):
+        engine = self.engine
+        if engine.level_data["type"] == GameType.ROWS:
+            width = self.width // 2 - engine.line_width // 2
+            height = self.height
+
+            context.set_source_rgb(0.9, 0.9, 0.9)
+
+            if engine.over_option == engine.sides[0]:
+                context.rectangle(0, 0, width, height)
+                context.fill()
+
+            elif engine.over_option == engine.sides[1]:
+                context.rectangle(self.width // 2 + engine.line_width // 2, 0, width, height)
+                context.fill()
+
+        elif engine.level_data["type"] == GameType.CHOOSE:
+            chosen_cat = engine.chosen_cat
+            if chosen_cat is not None:
+
+                width = chosen_cat.width + 20
+                height = chosen_cat.height + 20
+
+                context.set_source_rgb(0.9, 0.9, 0.9)
+                context.rectangle(chosen_cat.x - 10, chosen_cat.y - 10, width, height)
+                context.fill()
+
+    def __draw_timeout(self, context):
+        y = self.height // 2 - 5
+
+        message = "%s %d %s" % (_("You have"), self.engine.count, _("seconds left"))
+        self.show_message(context, message, 20, y)
+
+    def __draw_bonus_message(self, context):
+        if self.engine.reaction_time != 0 and self.engine.win:
+            message = "%s %d" % (_("Bonus +"), self.engine.reaction_time)
+            self.show_message(context, message, 30, -140)
+
+    def __draw_current_score(self, context):
+        if self.engine.win:
+            message = "%s %d" % (_("Your Score: "), self.engine.score)
+            self.show_message(context, message, 40, -100)
+
+    def __draw_choose_options(self, context):
+        scale = self.scale
+        for cat in self.engine.choose_option_cats:
+            draw_cat(context, cat, scale)
+
+    def __draw_size_label(self, context):
+        level_type = self.engine.level_data["type"]
+
+        message1 = _("Even cats")
+        message2 = _("Odd cats")
+        if self.engine.sides[0] == SideType.ODD:
+            backup = message1
+            message1 = message2
+            message2 = backup
+
+        context.set_source_rgb(0, 0, 0)
+        context.set_font_size(20)
+
+        xb, yb, width, height, xa, ya = context.text_extents(message1)
+        y = self.height // 2 + height // 2
+        if level_type == GameType.DIVIDED_SCREEN:
+            x = self.width // 4 - width // 2
+        elif level_type == GameType.ROWS:
+            x = self.width // 6 - width // 2
+
+        context.move_to(x, y)
+        context.show_text(message1)
+
+        xb, yb, width, height, xa, ya = context.text_extents(message2)
+        y = self.height // 2 + height // 2
+        if level_type == GameType.DIVIDED_SCREEN:
+            x = self.width // 4 * 3 - width // 2
+        elif level_type == GameType.ROWS:
+            x = self.width // 6 * 5 - width // 2
+
+        context.move_to(x, y)
+        context.show_text(message2)
+
+    def __draw_count(self, context):
+        message = "%s %d %s" % (_("The game will start in"), self.engine.count, _("seconds"))
+        y = self.show_message(context, message, 40)
+        self.__draw_help_message(context, y + 30)
+
+    def __draw_help_message(self, context, y):
+        message = ""
+        next_level = self.engine.get_next_level_data()
+
+        if next_level["type"] == GameType.DIVIDED_SCREEN:
+            message = _("Classify each kind of cat as even or odd")
+
+        elif next_level["type"] == GameType.ROWS:
+            message = _("Is the amount of cats on the screen even or odd?")
+
+        elif next_level["type"] == GameType.CHOOSE:
+            if self.engine.choose_type:
+                message = _("Choose the cat which has an odd count")
+            else:
+                message = _("Choose the cat which has an even count")
+
+        self.show_message(context, message, 50, y)
+
+    def __draw_end_message(self, context):
+        y = -50
+
+        message = get_result_message(self.engine.result)
+        y = self.show_message(context, message, 40, y)
+
+        message = "%s %d %s" % (_("The game will restart in"), self.engine.count, _("seconds"))
+        y = self.show_message(context, message, 30, y + 40)
+
+        self.__draw_help_message(context, y + 60)
+        self.__draw_current_score(context)
+        self.__draw_bonus_message(context)
+
+    def __draw_welcome_message(self, context):
+        message = _("Click on the star to start the game.")
+        y = self.show_message(context, message, 64)
+
+        message = _("(And click the star again to stop it)")
+        self.show_message(context, message, 24, y)
+
+    def __draw_gameover(self, context):
+        message = _("Game Over")
+        self.show_message(context, message, 124, -100)
+        your_score = "%s %d" % (_("Your Score:"), self.engine.score)
+        self.show_message(context, your_score, 60, 50)
+        high_score = "%s %d" % (_("High Score:"), self.engine.highscore)
+        self.show_message(context, high_score, 60, 150)
+        message = _("Click on the star to start the game.")
+        self.show_message(context, message, 30, 250)
+
+    def show_message(self, context, message, font_size, y=0):
+        font_size, width, height = self.text_cache.fit(
+            context, message, font_size, self.width)
+
+        context.set_font_size(font_size)
+        context.set_source_rgb(0, 0, 0)
+        context.move_to(self.width // 2 - width // 2, self.height // 2 + y)
+        context.show_text(message)
+
+        return y + height
+
+
+def render_frame(renderer, width, height, surface=None):
+    if surface is None:
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+
+    context = cairo.Context(surface)
+    renderer.draw(context, width, height)
+    surface.flush()
+    return surface
+
@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+# Records the input a GameEngine receives and replays it headless at
+# full speed. A recording is a JSON header line followed by one line per
+# event: "<kind> <milliseconds> [<arguments>]", where kind is one of
+#
+#   m x y  pointer motion     p x y  button press      r x y  button release
+#   a w h  new allocation     s cap  game started      x      game stopped
+#   e      end of the recording
+#
+# cap is the device cat cap the game was started with, 0 for none.
+#
+#   python3 replay.py session.rec
+
+import json
+import sys
+import time
+
+from engine import GameEngine
+
+
+RECORDING_VERSION = 2
+
+
+class InputRecorder(object):
+
+    def __init__(self, path, seed, width, height, max_cats=None):
+        self.file = open(path, "w")
+        self.start_time = time.monotonic()
+
+        header = {"version": RECORDING_VERSION,
+                  "seed": seed,
+                  "width": width,
+                  "height": height,
+                  "max_cats": max_cats}
+        self.file.write(json.dumps(header) + "\n")
+
+    def record(self, kind, *args):
+        if self.file is None:
+            return
+
+        t = int(round((time.monotonic() - self.start_time) * 1000))
+        fields = [kind, "%d" % t] + ["%g" % arg for arg in args]
+        self.file.write(" ".join(fields) + "\n")
+
+    def close(self):
+        if self.file is None:
+            return
+
+        self.record("e")
+        self.file.close()
+        self.file = None
+
+
+def read_recording(path):
+    with open(path) as file:
+        header = json.loads(file.readline())
+        events = []
+        for line in file:
+            fields = line.split()
+            if not fields:
+                continue
+
+            events.append((fields[0], int(fields[1]),
+                           tuple(float(field) for field in fields[2:])))
+
+    return header, events
+
+
+def advance_to(engine, seconds):
+    # Stops the manual clock at every deadline on the way, so a timer
+    # started by another one begins when it would have in the main loop.
+    while engine.timers.countdowns:
+        deadline = min(countdown.deadline for countdown in engine.timers.countdowns)
+        if deadline > seconds:
+            break
+
+        engine.clock.now = max(engine.clock.now, deadline)
+        engine.timers.poll()
+
+    engine.clock.now = max(engine.clock.now, seconds)
+    engine.timers.poll()
+
+
+def replay(path, levels_path="levels.json"):
+    header, events = read_recording(path)
+    engine = GameEngine(levels_path, seed=header["seed"])
+    engine.set_size(header["width"], header["height"])
+    engine.next_max_cats = header.get("max_cats")
+
+    handlers = {"m": engine.motion,
+                "p": engine.press,
+                "r": engine.release}
+    handler_times = dict((kind, 0.0) for kind in handlers)
+    handler_counts = dict((kind, 0) for kind in handlers)
+    now = 0
+
+    start = time.perf_counter()
+    for kind, t, args in events:
+        if t > now:
+            advance_to(engine, t / 1000.0)
+            now = t
+
+        if kind in handlers:
+            handler_start = time.perf_counter()
+            handlers[kind](*args[:2])
+            handler_times[kind] += time.perf_counter() - handler_start
+            handler_counts[kind] += 1
+
+        elif kind == "a":
+            engine.set_size(int(args[0]), int(args[1]))
+
+        elif kind == "s":
+            if args:
+                engine.next_max_cats = int(args[0]) or None
+
+            engine.start()
+
+        elif kind == "x":
+            engine.stop()
+
+    total_time = time.perf_counter() - start
+
+    return {"events": len(events),
+            "duration_ms": now,
+            "replay_ms": total_time * 1000,
+            "handlers": dict((kind, {"count": handler_counts[kind],
+                                     "total_ms": handler_times[kind] * 1000})
+                             for kind in handlers),
+            "final_state": {"state": engine.state,
+                            "level": engine.level,
+                            "score": engine.score,
+                            "puzzle_count": engine.puzzle_count,
+                            "win": engine.win}}
+
+
+if __name__ == "__main__":
+    for path in sys.argv[1:]:
+        print(json.dumps(replay(path), sort_keys=True))
@@ -0,0 +1,179 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import math
+
+from array import array
+
+
+class Scene(object):
+
+    # Holds the rows of a CatStore in paint order (bottom to top): each row
+    # has a z value, so raising a cat is O(1). DIVIDED_SCREEN scenes also
+    # keep a uniform grid, so point and area queries only look at the rows
+    # in the touched cells, each cell being a compact array of rows; grid
+    # levels are never queried and skip it.
+    # Cats are handed out as Cat views of the store.
+
+    def __init__(self, cell_size=128):
+        self.cell_size = cell_size
+        self.store = None
+        self.indexed = False
+        self._z = array("L")
+        self._next_z = 0
+        self._cells = {}
+        self._bounds = array("i")
+
+    def __len__(self):
+        return len(self._z)
+
+    def __iter__(self):
+        store = self.store
+        for index in sorted(range(len(self._z)), key=self._z.__getitem__):
+            yield store[index]
+
+    def __contains__(self, cat):
+        return self.store is not None and cat.store is self.store
+
+    def set_store(self, store, indexed=True):
+        # The first row ends up at the top.
+        self.clear()
+        self.store = store
+        self.indexed = indexed
+        count = len(store)
+        self._z = array("L", range(count - 1, -1, -1))
+        self._next_z = count
+        self.update_all()
+
+    def clear(self):
+        self.store = None
+        self._z = array("L")
+        self._next_z = 0
+        self._cells.clear()
+        self._bounds = array("i")
+
+    def raise_to_top(self, cat):
+        self._z[cat.index] = self._next_z
+        self._next_z += 1
+
+    def update(self, cat):
+        # Must be called after moving or resizing a cat.
+        if not self.indexed:
+            return
+
+        index = cat.index
+        bounds = self._get_bounds(cat.x, cat.y, cat.width, cat.height)
+        if bounds != tuple(self._bounds[index * 4:index * 4 + 4]):
+            self._unindex(index)
+            self._index(index, bounds)
+
+    def update_all(self):
+        self._cells.clear()
+        self._bounds = array("i")
+        if not self.indexed:
+            return
+
+        store = self.store
+        self._bounds = array("i", [0]) * (len(store) * 4)
+        for index, x, y, width, height in zip(range(len(store)), store.xs, store.ys,
+                                              store.widths, store.heights):
+            self._index(index, self._get_bounds(x, y, width, height))
+
+    def pick(self, x, y):
+        # Returns the topmost cat under the point, if any.
+        if self.store is None:
+            return None
+
+        if self.indexed:
+            key = (int(math.floor(x / self.cell_size)),
+                   int(math.floor(y / self.cell_size)))
+            indices = self._cells.get(key, ())
+        else:
+            indices = range(len(self._z))
+
+        store = self.store
+        xs, ys, widths, heights = store.xs, store.ys, store.widths, store.heights
+        z = self._z
+
+        picked = None
+        picked_z = -1
+        for index in indices:
+            cat_x = xs[index]
+            cat_y = ys[index]
+            if cat_x <= x <= cat_x + widths[index] and cat_y <= y <= cat_y + heights[index]:
+                if z[index] > picked_z:
+                    picked = index
+                    picked_z = z[index]
+
+        if picked is None:
+            return None
+
+        return store[picked]
+
+    def query(self, x, y, width, height):
+        # Returns the cats intersecting the area, in paint order.
+        if self.store is None:
+            return []
+
+        if self.indexed:
+            x1, y1, x2, y2 = self._get_bounds(x, y, width, height)
+            cells = self._cells
+            indices = set()
+            for cx in range(x1, x2 + 1):
+                for cy in range(y1, y2 + 1):
+                    indices.update(cells.get((cx, cy), ()))
+        else:
+            indices = range(len(self._z))
+
+        store = self.store
+        xs, ys, widths, heights = store.xs, store.ys, store.widths, store.heights
+        found = [index for index in indices
+                 if xs[index] < x + width and xs[index] + widths[index] > x and
+                 ys[index] < y + height and ys[index] + heights[index] > y]
+        found.sort(key=self._z.__getitem__)
+
+        return [store[index] for index in found]
+
+    def _get_bounds(self, x, y, width, height):
+        # The range of cells covered, inclusive.
+        size = self.cell_size
+        return (int(math.floor(x / size)), int(math.floor(y / size)),
+                int(math.floor((x + width) / size)), int(math.floor((y + height) / size)))
+
+    def _index(self, index, bounds):
+        self._bounds[index * 4:index * 4 + 4] = array("i", bounds)
+        x1, y1, x2, y2 = bounds
+        cells = self._cells
+        for cx in range(x1, x2 + 1):
+            for cy in range(y1, y2 + 1):
+                cell = cells.get((cx, cy))
+                if cell is None:
+                    cells[(cx, cy)] = cell = array("L")
+
+                cell.append(index)
+
+    def _unindex(self, index):
+        x1, y1, x2, y2 = self._bounds[index * 4:index * 4 + 4]
+        cells = self._cells
+        for cx in range(x1, x2 + 1):
+            for cy in range(y1, y2 + 1):
+                cell = cells.get((cx, cy))
+                if cell is not None:
+                    cell.remove(index)
+                    if not cell:
+                        del cells[(cx, cy)]
@@ -0,0 +1,183 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import hashlib
+import logging
+import os
+
+from collections import OrderedDict
+
+import gi
+gi.require_version("Gdk", "3.0")
+gi.require_version("GdkPixbuf", "2.0")
+
+from gi.repository import Gdk
+from gi.repository import GdkPixbuf
+from gi.repository import GLib
+
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), "images")
+
+# Bump it whenever the way sprites are rasterized changes, so old files
+# in the disk cache are not used anymore.
+DISK_CACHE_VERSION = 1
+PRELOAD_SIZES = [120, 60]
+
+
+def get_cat_image_path(cat_id):
+    return os.path.join(IMAGES_DIR, "cat" + str(cat_id) + ".svg")
+
+
+class SpriteCache(object):
+
+    # Every Cat of the same kind and size shares one premultiplied cairo
+    # surface, so the SVG is only parsed and rasterized the first time a
+    # size is used. The pixbuf is dropped once converted, only the
+    # surface is painted. Sprites handed out by the cache must never be
+    # modified.
+
+    def __init__(self, max_size=32):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.disk_cache_dir = None
+        self._surfaces = OrderedDict()
+        self._svg_stamps = {}
+
+    def get_surface(self, cat_id, width, height, scale=1):
+        key = (cat_id, width, height, scale)
+        return self._lookup(self._surfaces, key, self._load_surface)
+
+    def _lookup(self, cache, key, load):
+        sprite = cache.get(key)
+
+        if sprite is not None:
+            self.hits += 1
+            cache.move_to_end(key)
+            return sprite
+
+        self.misses += 1
+        sprite = load(*key)
+        cache[key] = sprite
+
+        while len(cache) > self.max_size:
+            cache.popitem(last=False)
+
+        return sprite
+
+    def _load_surface(self, cat_id, width, height, scale):
+        # The surface keeps the device scale, so it is painted at the
+        # logical size of the cat on HiDPI screens.
+        pixbuf = self._load(cat_id, width * scale, height * scale)
+        return Gdk.cairo_surface_create_from_pixbuf(pixbuf, scale, None)
+
+    def _load(self, cat_id, width, height):
+        cache_path = self._get_disk_cache_path(cat_id, width, height)
+        if cache_path is not None and os.path.exists(cache_path):
+            try:
+                pixbuf = GdkPixbuf.Pixbuf.new_from_file(cache_path)
+                self.disk_hits += 1
+                return pixbuf
+            except GLib.Error as e:
+                logging.warning("Ignoring broken sprite %s: %s", cache_path, e)
+
+        # Rasterize the SVG straight at the target size instead of
+        # decoding at its natural size and rescaling with HYPER.
+        pixbuf = GdkPixbuf.Pixbuf.new_from_file_at_scale(
+            get_cat_image_path(cat_id), width, height, False)
+
+        if cache_path is not None:
+            self._save(pixbuf, cache_path)
+
+        return pixbuf
+
+    def _save(self, pixbuf, path):
+        # Written aside and renamed, so a half written file is never read.
+        tmp_path = path + ".tmp"
+        try:
+            pixbuf.savev(tmp_path, "png", [], [])
+            os.rename(tmp_path, path)
+        except (GLib.Error, OSError) as e:
+            logging.warning("Can't save sprite %s: %s", path, e)
+
+    def _get_svg_stamp(self, cat_id):
+        stamp = self._svg_stamps.get(cat_id)
+        if stamp is None:
+            info = os.stat(get_cat_image_path(cat_id))
+            key = "%d-%d" % (info.st_mtime_ns, info.st_size)
+            stamp = hashlib.sha1(key.encode("utf-8")).hexdigest()[:12]
+            self._svg_stamps[cat_id] = stamp
+
+        return stamp
+
+    def _get_disk_cache_path(self, cat_id, width, height):
+        if self.disk_cache_dir is None:
+            return None
+
+        name = "v%d-cat%s-%dx%d-%s.png" % (DISK_CACHE_VERSION, cat_id, width, height,
+                                           self._get_svg_stamp(cat_id))
+        return os.path.join(self.disk_cache_dir, name)
+
+    def set_disk_cache_dir(self, path):
+        # Rasterized sprites are kept there between launches.
+        try:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+
+            prefix = "v%d-" % DISK_CACHE_VERSION
+            stamps = dict(("cat%d" % cat_id, self._get_svg_stamp(cat_id) + ".png")
+                          for cat_id in range(1, 5))
+            for name in os.listdir(path):
+                # Sprites rasterized from an older version of their SVG are
+                # dropped too, they would never be read again.
+                fields = name[len(prefix):].split("-")
+                if (not name.startswith(prefix) or len(fields) != 3 or
+                        stamps.get(fields[0]) != fields[2]):
+                    os.remove(os.path.join(path, name))
+
+        except OSError as e:
+            logging.warning("Can't use %s as sprite cache: %s", path, e)
+            return
+
+        self.disk_cache_dir = path
+
+    def preload(self, sizes=PRELOAD_SIZES, scales=(1,)):
+        # Warms one sprite per idle iteration, so the UI stays responsive.
+        pending = [(cat_id, size, size, scale)
+                   for scale in scales for size in sizes for cat_id in range(1, 5)]
+
+        def preload_cb():
+            self.get_surface(*pending.pop(0))
+            return len(pending) > 0
+
+        if pending:
+            GLib.idle_add(preload_cb, priority=GLib.PRIORITY_LOW)
+
+    def clear(self):
+        self._surfaces.clear()
+
+    def get_stats(self):
+        return {"size": len(self._surfaces),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits}
+
+
+sprite_cache = SpriteCache()
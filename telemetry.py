@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+# Every finished round is appended to the log as one line:
+#
+#   <unix time> <level> <game type> <cats> <win> <reaction ms or -> <score delta>
+
+import logging
+import os
+import queue
+import threading
+import time
+
+
+class RoundLog(object):
+
+    # record() only puts the round in a queue; a background thread waits
+    # flush_interval seconds after the first queued round, writes every
+    # round queued by then in one go, and rotates the file once it grows
+    # past max_bytes, keeping the last backups files as <path>.1, <path>.2...
+    # close() writes what is left without waiting.
+
+    def __init__(self, path, max_bytes=256 * 1024, backups=2, flush_interval=5.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.queue = queue.Queue()
+        self.closing = threading.Event()
+        self.thread = None
+
+    def start(self):
+        if self.thread is not None:
+            return
+
+        self.thread = threading.Thread(target=self.__run, name="round-log")
+        self.thread.daemon = True
+        self.thread.start()
+
+    def record(self, level, game_type, cats, win, reaction_time_ms, score_delta):
+        self.queue.put((int(time.time()), level, game_type, cats, win,
+                        reaction_time_ms, score_delta))
+
+    def close(self):
+        if self.thread is None:
+            return
+
+        self.closing.set()
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+        self.closing.clear()
+
+    def __run(self):
+        running = True
+        while running:
+            rounds = [self.queue.get()]
+            if rounds[0] is not None:
+                self.closing.wait(self.flush_interval)
+
+            while True:
+                try:
+                    rounds.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if None in rounds:
+                running = False
+                rounds = [data for data in rounds if data is not None]
+
+            if rounds:
+                try:
+                    self.write(rounds)
+                except (IOError, OSError) as e:
+                    logging.warning("Can't write the round log: %s", e)
+
+    def write(self, rounds):
+        lines = []
+        for timestamp, level, game_type, cats, win, reaction_time_ms, score_delta in rounds:
+            lines.append("%d %s %d %d %d %s %d\n" % (
+                timestamp, level, game_type, cats, int(bool(win)),
+                "-" if reaction_time_ms is None else "%d" % reaction_time_ms,
+                score_delta))
+
+        with open(self.path, "a") as file:
+            file.write("".join(lines))
+
+        if os.path.getsize(self.path) > self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        for index in range(self.backups - 1, 0, -1):
+            src = "%s.%d" % (self.path, index)
+            if os.path.exists(src):
+                os.rename(src, "%s.%d" % (self.path, index + 1))
+
+        if self.backups > 0:
+            os.rename(self.path, self.path + ".1")
+        else:
+            os.remove(self.path)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+MIN_FONT_SIZE = 5
+
+
+class TextLayoutCache(object):
+
+    # Remembers the font size a message had to be shrunk to so it fits in
+    # a given width, and its extents at that size. The key holds the
+    # already translated message, so a locale change never hits stale
+    # entries; the cache is only cleared to release memory.
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self._layouts = {}
+
+    def fit(self, context, message, font_size, max_width):
+        key = (message, font_size, max_width)
+        layout = self._layouts.get(key)
+        if layout is not None:
+            return layout
+
+        size = font_size
+        while True:
+            context.set_font_size(size)
+            xb, yb, width, height, xa, ya = context.text_extents(message)
+            if width <= max_width or size - 5 < MIN_FONT_SIZE:
+                break
+
+            size -= 5
+
+        if len(self._layouts) >= self.max_size:
+            self._layouts.clear()
+
+        layout = (size, width, height)
+        self._layouts[key] = layout
+        return layout
+
+    def clear(self):
+        self._layouts.clear()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 3 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+import math
+import time
+
+
+class ManualClock(object):
+
+    # A clock which only moves when told to, used to drive the game
+    # headless.
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class Countdown(object):
+
+    # Counts down to a fixed deadline on a monotonic clock. The main loop
+    # is only woken when the number of whole seconds left changes, and
+    # every wake-up is computed from the deadline, so a busy main loop
+    # delays a tick but never makes the countdown drift.
+
+    def __init__(self, service, duration, callback=None, tick_cb=None):
+        self.service = service
+        self.duration = duration
+        self.callback = callback
+        self.tick_cb = tick_cb
+        self.start_time = service.clock()
+        self.deadline = self.start_time + duration
+        self.seconds_left = self.get_seconds_left()
+        self.source_id = None
+        self.active = True
+
+    def get_remaining(self):
+        return max(0.0, self.deadline - self.service.clock())
+
+    def get_elapsed(self):
+        return min(self.duration, self.service.clock() - self.start_time)
+
+    def get_elapsed_ms(self):
+        return int(round(self.get_elapsed() * 1000))
+
+    def get_seconds_left(self):
+        return int(math.ceil(self.get_remaining()))
+
+    def get_fraction_left(self):
+        if self.duration <= 0:
+            return 0.0
+
+        return self.get_remaining() / self.duration
+
+    def schedule(self):
+        if self.service.timeout_add is None:
+            return
+
+        remaining = self.get_remaining()
+        delay = remaining - (math.ceil(remaining) - 1)
+        self.source_id = self.service.timeout_add(
+            max(1, int(math.ceil(delay * 1000))), self.__timeout_cb)
+
+    def __timeout_cb(self):
+        self.source_id = None
+        self.poll()
+        return False
+
+    def poll(self):
+        if not self.active:
+            return
+
+        seconds_left = self.get_seconds_left()
+        if seconds_left <= 0:
+            self.active = False
+            self.service.remove(self)
+            self.seconds_left = 0
+            if self.callback is not None:
+                self.callback()
+
+            return
+
+        if seconds_left != self.seconds_left:
+            self.seconds_left = seconds_left
+            if self.tick_cb is not None:
+                self.tick_cb(seconds_left)
+
+        self.schedule()
+
+    def cancel(self):
+        if self.source_id is not None and self.service.source_remove is not None:
+            self.service.source_remove(self.source_id)
+
+        self.source_id = None
+        self.active = False
+        self.service.remove(self)
+
+
+class TimerService(object):
+
+    def __init__(self, timeout_add=None, source_remove=None, clock=time.monotonic):
+        # Without timeout_add nothing is scheduled, poll() must be called
+        # after moving the clock.
+        self.timeout_add = timeout_add
+        self.source_remove = source_remove
+        self.clock = clock
+        self.countdowns = []
+
+    def start(self, duration, callback=None, tick_cb=None):
+        countdown = Countdown(self, duration, callback, tick_cb)
+        self.countdowns.append(countdown)
+        countdown.schedule()
+        return countdown
+
+    def remove(self, countdown):
+        if countdown in self.countdowns:
+            self.countdowns.remove(countdown)
+
+    def poll(self):
+        for countdown in list(self.countdowns):
+            countdown.poll()